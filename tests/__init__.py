@@ -0,0 +1,6 @@
+import os
+
+# 导入 xyz_tablestore 时模块级的 Manager / Store 会创建 OTSClient，需要先有连接参数
+os.environ.setdefault('OTS_ENDPOINT', 'http://localhost')
+os.environ.setdefault('OTS_KEY_ID', 'test')
+os.environ.setdefault('OTS_KEY_SECRET', 'test')
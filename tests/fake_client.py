@@ -0,0 +1,244 @@
+"""
+内存中的 OTSClient 替身，只实现测试用到的接口和查询类型
+"""
+import logging, re
+from tablestore import *
+
+
+class FakeRows:
+    def __init__(self, rows, next_token=b'', total_count=0):
+        self.rows = rows
+        self.next_token = next_token
+        self.total_count = total_count
+
+
+def _wildcard_regex(pattern):
+    # * 匹配任意串，? 匹配单个字符，反斜杠转义下一个字符
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        elif c == '*':
+            out.append('.*')
+        elif c == '?':
+            out.append('.')
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(out) + r'\Z', re.S)
+
+
+def _same(a, b):
+    # 与服务端一致：不同类型的列值（如 1 和 True）不相等
+    return type(a) is type(b) and a == b
+
+
+def match_query(query, row):
+    if isinstance(query, MatchAllQuery):
+        return True
+    if isinstance(query, TermQuery):
+        return query.field_name in row and _same(row[query.field_name], query.column_value)
+    if isinstance(query, TermsQuery):
+        return query.field_name in row and any(_same(row[query.field_name], v) for v in query.column_values)
+    if isinstance(query, RangeQuery):
+        if query.field_name not in row:
+            return False
+        v = row[query.field_name]
+        if query.range_from is not None and not (v >= query.range_from if query.include_lower else v > query.range_from):
+            return False
+        if query.range_to is not None and not (v <= query.range_to if query.include_upper else v < query.range_to):
+            return False
+        return True
+    if isinstance(query, WildcardQuery):
+        v = row.get(query.field_name)
+        return isinstance(v, str) and _wildcard_regex(query.value).match(v) is not None
+    if isinstance(query, ExistsQuery):
+        return row.get(query.field_name) is not None
+    if isinstance(query, BoolQuery):
+        if not all(match_query(q, row) for q in (query.must_queries or []) + (query.filter_queries or [])):
+            return False
+        if any(match_query(q, row) for q in query.must_not_queries or []):
+            return False
+        if query.should_queries:
+            n = sum(1 for q in query.should_queries if match_query(q, row))
+            return n >= (query.minimum_should_match or 1)
+        return True
+    raise NotImplementedError(type(query).__name__)
+
+
+_COMPARE = {
+    ComparatorType.EQUAL: lambda a, b: a == b,
+    ComparatorType.NOT_EQUAL: lambda a, b: a != b,
+    ComparatorType.GREATER_THAN: lambda a, b: a > b,
+    ComparatorType.GREATER_EQUAL: lambda a, b: a >= b,
+    ComparatorType.LESS_THAN: lambda a, b: a < b,
+    ComparatorType.LESS_EQUAL: lambda a, b: a <= b,
+}
+
+
+def match_condition(cond, row):
+    if cond is None:
+        return True
+    if isinstance(cond, SingleColumnCondition):
+        if cond.column_name not in row:
+            return cond.pass_if_missing
+        return _COMPARE[cond.comparator](row[cond.column_name], cond.column_value)
+    if cond.combinator == LogicalOperator.AND:
+        return all(match_condition(c, row) for c in cond.sub_conditions)
+    if cond.combinator == LogicalOperator.OR:
+        return any(match_condition(c, row) for c in cond.sub_conditions)
+    return not match_condition(cond.sub_conditions[0], row)
+
+
+class FakeOTSClient:
+    """
+    按主键保存 {列名: 值} 的行:
+    - search 支持 Term/Terms/Range/Wildcard/Exists/Bool/MatchAll、排序、offset、next_token、total_count
+    - get_range 支持方向、limit、列条件
+    - put_row / update_row / get_row / batch_write_row / batch_get_row
+    所有调用按 (方法名, 参数) 记录在 calls 中
+    """
+
+    def __init__(self, pks=('id',), rows=()):
+        self.pks = list(pks)
+        self.tables = {}
+        self.calls = []
+        self.indexes = set()  # (表名, 索引名)
+        self.logger = logging.getLogger('fake_ots')
+        for row in rows:
+            self.add('test', row)
+
+    def add(self, table_name, row):
+        key = tuple(row[pk] for pk in self.pks)
+        self.tables.setdefault(table_name, {})[key] = dict(row)
+
+    def rows(self, table_name):
+        return [r for k, r in sorted(self.tables.get(table_name, {}).items())]
+
+    def _split(self, row):
+        pk = [(k, row[k]) for k in self.pks]
+        attrs = [(k, v, 0) for k, v in row.items() if k not in self.pks]
+        return pk, attrs
+
+    # ---------- 多元索引 ----------
+
+    def list_search_index(self, table_name=None):
+        self.calls.append(('list_search_index', dict(table_name=table_name)))
+        return [(t, i) for t, i in sorted(self.indexes) if table_name is None or t == table_name]
+
+    def search(self, table_name, index_name, search_query, columns_to_get=None, routing_keys=None, timeout_s=None):
+        self.calls.append(('search', dict(
+            table_name=table_name, index_name=index_name, search_query=search_query,
+            columns_to_get=columns_to_get, routing_keys=routing_keys
+        )))
+        rows = [r for r in self.rows(table_name) if match_query(search_query.query, r)]
+        sort = search_query.sort
+        if sort:
+            for s in reversed(sort.sorters):
+                desc = s.sort_order == SortOrder.DESC
+                rows.sort(key=lambda r: (r.get(s.field_name) is not None, r.get(s.field_name)), reverse=desc)
+        total = len(rows) if search_query.get_total_count else -1
+        start = int(search_query.next_token.decode()) if search_query.next_token else (search_query.offset or 0)
+        limit = search_query.limit if search_query.limit is not None else 10
+        page = rows[start:start + limit]
+        next_token = str(start + limit).encode() if limit and start + limit < len(rows) else b''
+        return FakeRows([tuple(self._split(r)) for r in page], next_token, total)
+
+    # ---------- 主键 ----------
+
+    def get_range(self, table_name, direction, inclusive_start_primary_key, exclusive_end_primary_key,
+                  columns_to_get=None, limit=None, column_filter=None, max_version=1, **kwargs):
+        self.calls.append(('get_range', dict(
+            table_name=table_name, direction=direction, start=inclusive_start_primary_key, limit=limit
+        )))
+        rows = self.rows(table_name)
+        if direction == Direction.BACKWARD:
+            rows.reverse()
+        start = [v for k, v in inclusive_start_primary_key]
+        if not isinstance(start[0], (type(INF_MIN), type(INF_MAX))):
+            key = tuple(start)
+            if direction == Direction.FORWARD:
+                rows = [r for r in rows if tuple(r[pk] for pk in self.pks) >= key]
+            else:
+                rows = [r for r in rows if tuple(r[pk] for pk in self.pks) <= key]
+        matched = []
+        next_pk = None
+        for r in rows:
+            if limit is not None and len(matched) >= limit:
+                next_pk = [(pk, r[pk]) for pk in self.pks]
+                break
+            if match_condition(column_filter, r):
+                matched.append(r)
+        return None, next_pk, [Row(*self._split(r)) for r in matched], None
+
+    def get_row(self, table_name, primary_key, columns_to_get=None, column_filter=None, max_version=1, **kwargs):
+        self.calls.append(('get_row', dict(table_name=table_name, primary_key=primary_key)))
+        r = self.tables.get(table_name, {}).get(tuple(v for k, v in primary_key))
+        return None, (Row(*self._split(r)) if r else None), None
+
+    def put_row(self, table_name, row, condition=None, return_type=None, transaction_id=None):
+        self.calls.append(('put_row', dict(table_name=table_name, row=row)))
+        self._put(table_name, row)
+        return None, None
+
+    def update_row(self, table_name, row, condition=None, return_type=None, transaction_id=None):
+        self.calls.append(('update_row', dict(table_name=table_name, row=row)))
+        self._update(table_name, row)
+        return None, None
+
+    def delete_row(self, table_name, row, condition=None, return_type=None, transaction_id=None):
+        self.calls.append(('delete_row', dict(table_name=table_name, row=row)))
+        self.tables.get(table_name, {}).pop(tuple(v for k, v in row.primary_key), None)
+        return None, None
+
+    def _put(self, table_name, row):
+        d = dict(row.primary_key)
+        d.update((c[0], c[1]) for c in row.attribute_columns)
+        self.add(table_name, d)
+
+    def _update(self, table_name, row):
+        key = tuple(v for k, v in row.primary_key)
+        d = self.tables.setdefault(table_name, {}).setdefault(key, dict(row.primary_key))
+        for action, cols in row.attribute_columns.items():
+            action = action.upper()
+            for c in cols:
+                if action == 'PUT':
+                    d[c[0]] = c[1]
+                elif action in ('DELETE', 'DELETE_ALL'):
+                    d.pop(c if isinstance(c, str) else c[0], None)
+
+    # 返回 None 表示成功，否则返回 (error_code, error_message)，测试中替换以模拟失败
+    def write_error(self, table_name, item):
+        return None
+
+    def batch_write_row(self, request):
+        self.calls.append(('batch_write_row', dict(items={t: len(i.row_items) for t, i in request.items.items()})))
+        response = {}
+        for table_name, table_item in request.items.items():
+            response[table_name] = []
+            for item in table_item.row_items:
+                error = self.write_error(table_name, item)
+                if error is None:
+                    if item.type == BatchWriteRowType.PUT:
+                        self._put(table_name, item.row)
+                    elif item.type == BatchWriteRowType.UPDATE:
+                        self._update(table_name, item.row)
+                    else:
+                        self.tables.get(table_name, {}).pop(tuple(v for k, v in item.row.primary_key), None)
+                    response[table_name].append(BatchWriteRowResponseItem(True, '', '', None, item.row.primary_key))
+                else:
+                    response[table_name].append(BatchWriteRowResponseItem(False, error[0], error[1], None, None))
+        return BatchWriteRowResponse(request, response)
+
+    def batch_get_row(self, request):
+        self.calls.append(('batch_get_row', dict(items={t: len(i.primary_keys) for t, i in request.items.items()})))
+        response = {}
+        for table_name, table_item in request.items.items():
+            response[table_name] = []
+            for pk in table_item.primary_keys:
+                r = self.tables.get(table_name, {}).get(tuple(v for k, v in pk))
+                pk_cols, attrs = self._split(r) if r else (None, None)
+                response[table_name].append(RowDataItem(True, None, None, table_name, None, pk_cols, attrs))
+        return BatchGetRowResponse(response)
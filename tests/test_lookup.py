@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+from tablestore import TermQuery, TermsQuery
+from xyz_tablestore import lookup
+from xyz_tablestore.lookup import build_tablestore_query, build_lookup_query, combine_bool_query
+from tests.fake_client import match_query
+
+
+class BuildQueryCacheTest(unittest.TestCase):
+
+    def test_scalar_types_do_not_share_cache(self):
+        q1 = build_tablestore_query({'flag': 1})
+        q2 = build_tablestore_query({'flag': True})
+        q3 = build_tablestore_query({'flag': 1.0})
+        self.assertIsInstance(q2, TermQuery)
+        self.assertIs(type(q1.column_value), int)
+        self.assertIs(type(q2.column_value), bool)
+        self.assertIs(type(q3.column_value), float)
+
+    def test_nested_types_do_not_share_cache(self):
+        q1 = build_tablestore_query({'flag__in': [1, 0]})
+        q2 = build_tablestore_query({'flag__in': [True, False]})
+        self.assertIsInstance(q2, TermsQuery)
+        self.assertEqual([type(v) for v in q1.column_values], [int, int])
+        self.assertEqual([type(v) for v in q2.column_values], [bool, bool])
+
+    def test_cached_query_is_reused(self):
+        with mock.patch('xyz_tablestore.lookup._build_query', wraps=lookup._build_query) as build:
+            q1 = build_tablestore_query({'cached__in': [1, 2]})
+            q2 = build_tablestore_query({'cached__in': [1, 2]})
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(q1.column_values, q2.column_values)
+
+    def test_returned_query_is_a_copy(self):
+        q1 = build_tablestore_query({'copied__in': [1, 2]})
+        q1.column_values.append(3)
+        self.assertEqual(build_tablestore_query({'copied__in': [1, 2]}).column_values, [1, 2])
+
+    def test_unhashable_converters_do_not_share_cache(self):
+        class Scale:
+            __hash__ = None
+
+            def __init__(self, n):
+                self.n = n
+
+            def __call__(self, v):
+                return int(v) * self.n
+
+        q1 = build_tablestore_query({'age': '5'}, field_types={'age': Scale(1)})
+        q2 = build_tablestore_query({'age': '5'}, field_types={'age': Scale(10)})
+        self.assertEqual((q1.column_value, q2.column_value), (5, 50))
+
+
+
+class WildcardLookupTest(unittest.TestCase):
+
+    def match(self, op, value, s):
+        query, is_not = build_lookup_query('name', op, value)
+        return match_query(query, {'name': s})
+
+    def test_contains_is_literal(self):
+        self.assertTrue(self.match('contains', 'a_b', 'xa_by'))
+        self.assertFalse(self.match('contains', 'a_b', 'xaXby'))
+        self.assertFalse(self.match('contains', '50%', '50 off'))
+        self.assertTrue(self.match('contains', 'a*b', 'a*b'))
+        self.assertFalse(self.match('contains', 'a*b', 'aXXb'))
+
+    def test_startswith_endswith_are_literal(self):
+        self.assertTrue(self.match('startswith', 'a?', 'a?c'))
+        self.assertFalse(self.match('startswith', 'a?', 'abc'))
+        self.assertTrue(self.match('endswith', '_1', 'x_1'))
+        self.assertFalse(self.match('endswith', '_1', 'xy1'))
+
+    def test_like_translates_sql_wildcards(self):
+        self.assertTrue(self.match('like', 'a_b%', 'aXbcd'))
+        self.assertFalse(self.match('like', 'a_b%', 'abcd'))
+
+
+
+class CombineBoolQueryTest(unittest.TestCase):
+
+    def test_dedupe_keeps_values_of_other_types(self):
+        q = combine_bool_query([TermQuery('f', 1), TermQuery('f', True), TermQuery('f', 1.0), TermQuery('f', 1)])
+        self.assertEqual([type(c.column_value) for c in q.must_queries], [int, bool, float])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+import unittest
+from xyz_tablestore import query as query_module
+from xyz_tablestore.query import TableStoreModel, Field
+from tests.fake_client import FakeOTSClient
+
+
+class Item(TableStoreModel):
+    class Meta:
+        table_name = 'items'
+        primary_keys = ['id']
+
+    id = Field(primary_key=True)
+    name = Field()
+    age = Field()
+
+
+def use_client(client):
+    # Manager.__get__ 每次返回新的 QuerySet, client 要设置在 Manager 上
+    Item.__dict__['objects'].client = client
+    return client
+
+
+def make_client(rows, index=True):
+    client = FakeOTSClient(pks=['id'])
+    if index:
+        client.indexes.add(('items', 'items_index'))
+    for row in rows:
+        client.add('items', row)
+    query_module._SEARCH_INDEX_CACHE.clear()
+    return use_client(client)
+
+
+def call_names(client):
+    return [c[0] for c in client.calls]
+
+
+class ExcludeTest(unittest.TestCase):
+
+    def setUp(self):
+        make_client([
+            {'id': 'a', 'name': 'x', 'age': 1, 'tag': 't'},
+            {'id': 'b', 'name': 'y', 'age': 2},
+            {'id': 'c', 'name': 'z', 'age': 3, 'tag': 'u'},
+        ])
+
+    def test_exclude_keeps_rows_missing_the_column(self):
+        self.assertEqual([o.id for o in Item.objects.exclude(tag='t')], ['b', 'c'])
+
+    def test_filter_on_missing_column_compares_as_none(self):
+        self.assertEqual([o.id for o in Item.objects.filter(tag__in=['t', 'u'])], ['a', 'c'])
+        self.assertEqual([o.id for o in Item.objects.exclude(tag__startswith='t')], ['b', 'c'])
+
+
+
+class EmptyInTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_client([{'id': str(i), 'name': 'n%d' % i, 'age': i} for i in range(3)])
+
+    def test_empty_in_returns_nothing(self):
+        self.assertEqual(list(Item.objects.filter(name__in=[]).order_by('-age')), [])
+        self.assertEqual(list(Item.objects.filter(name__in=[])), [])
+
+    def test_empty_in_search_query_matches_none(self):
+        qs = Item.objects.filter(name__in=[], age__gte=0)
+        self.assertEqual(qs._search(qs._build_search_query(), limit=10).rows, [])
+
+    def test_empty_in_count_and_exists(self):
+        self.assertEqual(Item.objects.filter(name__in=[]).count(), 0)
+        self.assertFalse(Item.objects.filter(name__in=[]).exists())
+        self.assertEqual(Item.objects.filter(name__in=[], age__gte=0).count(), 0)
+        self.assertEqual(self.client.calls, [])
+
+    def test_in_count_uses_total_count(self):
+        self.assertEqual(Item.objects.filter(name__in=['n0', 'n2']).count(), 2)
+        self.assertEqual(call_names(self.client), ['list_search_index', 'search'])
+
+    def test_excluding_empty_in_keeps_all(self):
+        self.assertEqual(len(list(Item.objects.exclude(name__in=[]).order_by('-age'))), 3)
+
+
+
+class NoSearchIndexTest(unittest.TestCase):
+    """表没有多元索引时退回到范围扫描 + 内存中过滤、排序"""
+
+    def setUp(self):
+        self.client = make_client([
+            {'id': 'a', 'name': 'bob', 'age': 3},
+            {'id': 'b', 'name': 'alice', 'age': 1},
+            {'id': 'c', 'name': 'carl', 'age': 2},
+        ], index=False)
+
+    def test_order_by_sorts_in_memory(self):
+        self.assertEqual([o.id for o in Item.objects.order_by('age')], ['b', 'c', 'a'])
+        self.assertEqual([o.id for o in Item.objects.order_by('-age')[:2]], ['a', 'c'])
+        self.assertNotIn('search', call_names(self.client))
+        self.assertIn('get_range', call_names(self.client))
+
+    def test_wildcard_filter_in_memory(self):
+        self.assertEqual([o.id for o in Item.objects.filter(name__contains='l')], ['b', 'c'])
+        self.assertEqual([o.id for o in Item.objects.filter(name__startswith='a')], ['b'])
+        self.assertNotIn('search', call_names(self.client))
+
+    def test_count_and_exists_scan_the_range(self):
+        self.assertEqual(Item.objects.count(), 3)
+        self.assertEqual(Item.objects.filter(age__gte=2).count(), 2)
+        self.assertEqual(Item.objects.filter(name__contains='a')[1:].count(), 1)
+        self.assertTrue(Item.objects.filter(name='carl').exists())
+        self.assertFalse(Item.objects.exclude(age__lt=5).exists())
+        self.assertNotIn('search', call_names(self.client))
+
+    def test_index_check_is_cached(self):
+        list(Item.objects.order_by('age'))
+        list(Item.objects.order_by('age'))
+        self.assertEqual(call_names(self.client).count('list_search_index'), 1)
+
+    def test_uses_search_when_index_exists(self):
+        self.client.indexes.add(('items', 'items_index'))
+        query_module._SEARCH_INDEX_CACHE.clear()
+        self.assertEqual([o.id for o in Item.objects.order_by('age')], ['b', 'c', 'a'])
+        self.assertIn('search', call_names(self.client))
+
+
+class InMemoryOrderingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_client([
+            {'id': 'a', 'name': 'x', 'age': 2},
+            {'id': 'b', 'name': 'y', 'age': 1},
+            {'id': 'c', 'name': 'x', 'age': 3},
+            {'id': 'd', 'name': 'y'},
+            {'id': 'e', 'age': 1},
+        ], index=False)
+
+    def ids(self, *fields):
+        return [o.id for o in Item.objects.order_by(*fields)]
+
+    def test_same_direction(self):
+        self.assertEqual(self.ids('name', 'age'), ['e', 'a', 'c', 'd', 'b'])
+        self.assertEqual(self.ids('-name', '-age'), ['b', 'd', 'c', 'a', 'e'])
+
+    def test_mixed_directions_numeric(self):
+        self.assertEqual(self.ids('name', '-age'), ['e', 'c', 'a', 'b', 'd'])
+
+    def test_mixed_directions_non_numeric(self):
+        # 降序字段是字符串时逐字段比较
+        self.assertEqual(self.ids('age', '-name'), ['d', 'b', 'e', 'a', 'c'])
+
+    def test_none_sorts_first_ascending_and_last_descending(self):
+        self.assertEqual(self.ids('age')[0], 'd')
+        self.assertEqual(self.ids('-age')[-1], 'd')
+
+
+class InMemoryStringLookupTest(unittest.TestCase):
+
+    def setUp(self):
+        make_client([
+            {'id': 'a', 'name': 'abc'},
+            {'id': 'b', 'name': 123},
+            {'id': 'c'},
+            {'id': 'd', 'name': 'xbc'},
+        ], index=False)
+
+    def ids(self, **kwargs):
+        return [o.id for o in Item.objects.filter(**kwargs)]
+
+    def test_str_rows_and_mixed_types(self):
+        # 第一行是 str, 其他行的 int 值仍按 str() 匹配, 缺失的列不匹配
+        self.assertEqual(self.ids(name__contains='bc'), ['a', 'd'])
+        self.assertEqual(self.ids(name__contains='2'), ['b'])
+        self.assertEqual(self.ids(name__startswith='1'), ['b'])
+        self.assertEqual(self.ids(name__endswith='3'), ['b'])
+
+    def test_generic_when_first_row_is_not_str(self):
+        make_client([{'id': 'a', 'name': 10}, {'id': 'b', 'name': 'x10'}], index=False)
+        self.assertEqual(self.ids(name__endswith='10'), ['a', 'b'])
+
+    def test_exclude(self):
+        self.assertEqual([o.id for o in Item.objects.exclude(name__startswith='a')], ['b', 'c', 'd'])
+
+
+class FilterKeyTest(unittest.TestCase):
+
+    def test_unknown_lookup_raises(self):
+        with self.assertRaises(ValueError):
+            Item.objects.filter(name__iexact='x')
+        with self.assertRaises(ValueError):
+            Item.objects.exclude(age__between=(1, 2))
+
+    def test_known_lookups(self):
+        qs = Item.objects.filter(name__startswith='x', age__gte=1, age=2)
+        self.assertEqual(sorted((f, l) for f, l, v, n in qs._iter_filters()),
+                         [('age', 'exact'), ('age', 'gte'), ('name', 'startswith')])
+
+
+class FilterDedupeTest(unittest.TestCase):
+
+    def test_equal_values_of_other_types_are_kept(self):
+        make_client([{'id': 'a', 'flag': 1}, {'id': 'b', 'flag': True}])
+        qs = Item.objects.filter(flag=1).filter(flag=True).filter(flag=1)
+        self.assertEqual(len(qs._pushdown_filters), 2)
+
+    def test_repeated_filter_is_kept_once(self):
+        qs = Item.objects.filter(name__in=['x']).filter(name__in=['x'])
+        self.assertEqual(len(qs._memory_filters), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+
+class BulkWriteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_client([{'id': '1', 'name': 'old'}])
+
+    def test_bulk_save(self):
+        failed = Item.bulk_save([Item(id=str(i), name='n%d' % i, age=i) for i in range(1, 4)])
+        self.assertEqual(failed, [])
+        self.assertEqual(self.client.rows('items'), [
+            {'id': '1', 'name': 'n1', 'age': 1}, {'id': '2', 'name': 'n2', 'age': 2}, {'id': '3', 'name': 'n3', 'age': 3}
+        ])
+        self.assertEqual(call_names(self.client), ['batch_write_row'])
+
+    def test_bulk_save_reports_failures(self):
+        self.client.write_error = lambda table_name, item: ('OTSParameterInvalid', 'bad') if item.row.primary_key[0][1] == '2' else None
+        failed = Item.bulk_save([Item(id='2', name='a'), Item(id='3', name='b')])
+        self.assertEqual([(f.index, f.error_code) for f in failed], [(0, 'OTSParameterInvalid')])
+        self.assertEqual([r['id'] for r in self.client.rows('items')], ['1', '3'])
+
+    def test_bulk_delete(self):
+        self.assertEqual(Item.bulk_delete([Item(id='1'), Item(id='9')]), [])
+        self.assertEqual(self.client.rows('items'), [])
@@ -0,0 +1,227 @@
+import unittest
+from unittest import mock
+from tablestore import SortOrder
+from xyz_tablestore import store as store_module
+from xyz_tablestore.store import Store
+from tests.fake_client import FakeOTSClient
+
+
+def make_store(rows=(), name='users'):
+    st = Store(name=name)
+    st.client = FakeOTSClient(pks=st.pks)
+    for row in rows:
+        st.client.add(name, row)
+    return st
+
+
+def search_calls(st):
+    return [c[1] for c in st.client.calls if c[0] == 'search']
+
+
+class CountCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        store_module._COUNT_CACHE.clear()
+        store_module._COUNT_FAST_CACHE.clear()
+        self.st = make_store([{'id': str(i), 'age': i} for i in range(3)])
+
+    def test_count_is_cached(self):
+        self.assertEqual(self.st.count({'age__gte': 1}), 2)
+        self.assertEqual(self.st.count({'age__gte': 1}), 2)
+        self.assertEqual(len(search_calls(self.st)), 1)
+
+    def test_count_cache_expires_after_fast_ttl(self):
+        self.st.COUNT_FAST_TTL = -1
+        self.assertEqual(self.st.count(), 3)
+        self.st.client.add('users', {'id': 'x', 'age': 5})
+        self.assertEqual(self.st.count(), 4)
+
+    def test_count_does_not_reuse_search_total(self):
+        self.st.search({}, page_no=1)
+        self.st.client.add('users', {'id': 'x', 'age': 5})
+        self.assertEqual(self.st.count(), 4)
+
+    def test_fresh_bypasses_cache(self):
+        self.assertEqual(self.st.count(), 3)
+        self.st.client.add('users', {'id': 'x', 'age': 5})
+        self.assertEqual(self.st.count(), 3)
+        self.assertEqual(self.st.count(fresh=True), 4)
+
+    def test_write_invalidates_count(self):
+        self.assertEqual(self.st.count(), 3)
+        self.st.insert({'id': '9', 'age': 9})
+        self.assertEqual(self.st.count(), 4)
+        self.st.save_many([{'id': 'a', 'age': 1}, {'id': 'b', 'age': 2}])
+        self.assertEqual(self.st.count(), 6)
+
+    def test_count_cached_during_write_is_not_reused(self):
+        # 写入过程中并发的 count 读到旧总数并写入缓存，写完之后不能再命中它
+        put_row = self.st.client.put_row
+        def slow_put_row(*args, **kwargs):
+            self.assertEqual(self.st.count(), 3)
+            return put_row(*args, **kwargs)
+        self.st.client.put_row = slow_put_row
+        self.st.insert({'id': '9', 'age': 9})
+        self.assertEqual(self.st.count(), 4)
+
+    def test_search_total_cached_during_write_is_not_reused(self):
+        search = self.st.client.search
+        def search_then_write(*args, **kwargs):
+            rs = search(*args, **kwargs)
+            self.st.insert({'id': '9', 'age': 9})
+            return rs
+        self.st.client.search = search_then_write
+        self.assertEqual(self.st.search({}, page_no=1)['total'], 3)
+        self.st.client.search = search
+        self.assertIsNone(store_module._COUNT_CACHE.get(self.st._count_key({})))
+        self.assertEqual(self.st.search({}, page_no=1)['total'], 4)
+
+    def test_write_of_other_table_keeps_cache(self):
+        self.assertEqual(self.st.count(), 3)
+        make_store(name='others').insert({'id': 'x'})
+        self.assertEqual(self.st.count(), 3)
+        self.assertEqual(len(search_calls(self.st)), 1)
+
+
+
+class PageTokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        store_module._PAGE_TOKEN_CACHE.clear()
+        self.st = make_store([{'id': '%02d' % i, 'age': i, 'name': 'n%d' % i} for i in range(25)])
+
+    def second_page_query(self, **kwargs):
+        self.st.search({'age__gte': 0}, page_no=2, page_size=10, **kwargs)
+        return search_calls(self.st)[-1]['search_query']
+
+    def test_cached_token_is_reused(self):
+        self.st.search({'age__gte': 0}, columns=['age'], page_no=1, page_size=10)
+        q = self.second_page_query(columns=['age'])
+        self.assertIsNotNone(q.next_token)
+
+    def test_dict_projection_reuses_token(self):
+        self.st.search({'age__gte': 0}, columns={'age': 1, 'name': 0}, page_no=1, page_size=10)
+        q = self.second_page_query(columns={'age': 1, 'name': 0})
+        self.assertIsNotNone(q.next_token)
+        self.assertEqual(search_calls(self.st)[-1]['columns_to_get'].column_names, ['age'])
+
+    def test_token_is_not_shared_across_columns(self):
+        self.st.search({'age__gte': 0}, columns=['age'], page_no=1, page_size=10)
+        q = self.second_page_query(columns=['name'])
+        self.assertIsNone(q.next_token)
+        self.assertEqual(q.offset, 10)
+
+    def test_token_is_not_shared_across_routing_keys(self):
+        self.st.search({'age__gte': 0}, page_no=1, page_size=10, routing_key={'id': '01'})
+        q = self.second_page_query(routing_key={'id': '02'})
+        self.assertIsNone(q.next_token)
+
+
+
+class SearchFromCursorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.st = make_store([{'id': '%02d' % i, 'age': i} for i in range(25)])
+
+    def page(self, skip_pages, cursor=None):
+        return self.st.search_from_cursor(cursor, skip_pages, {'age__gte': 0}, sort_fields=[('age', SortOrder.ASC)], page_size=10)
+
+    def test_skip_pages(self):
+        rs = self.page(1)
+        self.assertEqual([d['age'] for d in rs['items']], list(range(10, 20)))
+        self.assertTrue(rs['has_next'])
+        for call in search_calls(self.st):
+            self.assertIsNone(call['search_query'].offset)
+
+    def test_continue_from_cursor(self):
+        rs = self.st.search({'age__gte': 0}, sort_fields=[('age', SortOrder.ASC)], page_size=10)
+        rs = self.page(1, rs['next_token'])
+        self.assertEqual([d['age'] for d in rs['items']], list(range(20, 25)))
+        self.assertFalse(rs['has_next'])
+
+    def test_past_the_end(self):
+        rs = self.page(3)
+        self.assertEqual(rs['items'], [])
+        self.assertFalse(rs['has_more'])
+
+
+
+class FindTest(unittest.TestCase):
+
+    def test_pages_are_prefetched_by_token(self):
+        st = make_store([{'id': '%02d' % i, 'age': i} for i in range(25)])
+        rs = list(st.find({'age__gte': 0}, sort_fields=[('age', SortOrder.ASC)], page_size=10))
+        self.assertEqual([d['age'] for d in rs], list(range(25)))
+        calls = search_calls(st)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([c['search_query'].next_token is not None for c in calls], [False, True, True])
+        self.assertFalse(any(c['search_query'].get_total_count for c in calls))
+
+
+
+class AllTest(unittest.TestCase):
+
+    def test_batches_grow_until_batch_size(self):
+        st = make_store([{'id': '%03d' % i, 'age': i} for i in range(260)])
+        rs = list(st.all(batch_size=200))
+        self.assertEqual([d['id'] for d in rs], ['%03d' % i for i in range(260)])
+        self.assertEqual([c[1]['limit'] for c in st.client.calls if c[0] == 'get_range'], [50, 100, 200])
+
+    def test_empty_table(self):
+        st = make_store()
+        self.assertEqual(list(st.all()), [])
+
+
+
+class SaveManyTest(unittest.TestCase):
+
+    def test_failure_index_refers_to_caller_rows(self):
+        st = make_store()
+        attempts = {}
+        def write_error(table_name, item):
+            pk = item.row.primary_key[0][1]
+            attempts[pk] = attempts.get(pk, 0) + 1
+            if pk in ('03', '07') and attempts[pk] == 1:
+                return 'OTSServerBusy', 'retry'
+            if pk == '07':
+                return 'OTSParameterInvalid', 'bad row'
+            return None
+        st.client.write_error = write_error
+        rows = [{'id': '%02d' % i, 'age': i} for i in range(10)]
+        with self.assertLogs(level='WARNING'), mock.patch('time.sleep') as sleep:
+            failed = st.save_many(rows, batch=4)
+        # 第二批里 07 重试 3 次，每次等待时间翻倍；03 所在的第一批只重试一次
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.05, 0.05, 0.1, 0.2])
+        self.assertEqual([f.index for f in failed], [7])
+        self.assertEqual(rows[failed[0].index]['id'], '07')
+        self.assertEqual(attempts['03'], 2)
+        self.assertIn(('03',), st.client.tables['users'])
+
+
+
+class RoutingKeysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.st = make_store()
+
+    def test_accepted_forms(self):
+        rk = self.st._routing_keys
+        self.assertIsNone(rk(None))
+        self.assertEqual(rk('user1'), [[('id', 'user1')]])
+        self.assertEqual(rk(42), [[('id', 42)]])
+        self.assertEqual(rk({'id': 'user1'}), [[('id', 'user1')]])
+        self.assertEqual(rk([('id', 'user1')]), [[('id', 'user1')]])
+        self.assertEqual(rk([[('id', 'u1')], {'id': 'u2'}, 'u3']), [[('id', 'u1')], [('id', 'u2')], [('id', 'u3')]])
+
+    def test_invalid_routing_key(self):
+        for bad in (1.5, True, object(), [('id', 'u1'), 2.5]):
+            with self.assertRaises(ValueError):
+                self.st._routing_keys(bad)
+
+    def test_search_passes_routing_keys(self):
+        self.st.search({}, routing_key='user1')
+        self.assertEqual(search_calls(self.st)[-1]['routing_keys'], [[('id', 'user1')]])
+
+
+if __name__ == '__main__':
+    unittest.main()
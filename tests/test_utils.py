@@ -0,0 +1,103 @@
+import datetime, json, math, unittest
+from xyz_tablestore import utils
+
+
+DATA = {'t': datetime.datetime(2024, 1, 1, 12, 0, 0), 'd': datetime.date(2024, 1, 2), 's': '中文', 'n': [1, 2.5, None]}
+EXPECTED = '{"t":"2024-01-01T12:00:00","d":"2024-01-02","s":"中文","n":[1,2.5,null]}'
+
+
+class JsonDumpsTest(unittest.TestCase):
+
+    def assertSameJson(self, s):
+        # 各实现的输出逐字相同，不只是解析后相等
+        self.assertEqual(s, EXPECTED)
+
+    def test_json_dumps(self):
+        self.assertSameJson(utils.json_dumps(DATA))
+
+    def test_stdlib_matches(self):
+        self.assertSameJson(utils._std_dumps(DATA))
+
+    def test_aware_datetime(self):
+        t = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+        self.assertEqual(json.loads(utils.json_dumps([t])), ['2024-01-01T12:00:00+00:00'])
+        self.assertEqual(json.loads(utils._std_dumps([t])), ['2024-01-01T12:00:00+00:00'])
+
+    def test_encode_matches(self):
+        self.assertEqual(utils.encode(DATA), EXPECTED)
+
+    def test_unknown_types_become_strings(self):
+        import decimal
+        self.assertEqual(json.loads(utils.json_dumps({'x': decimal.Decimal('1.5')})), {'x': '1.5'})
+
+    def test_bytes_are_decoded(self):
+        self.assertEqual(utils.json_dumps({'b': b'abc', 'c': bytearray(b'\xe4\xb8\xad')}), '{"b":"abc","c":"中"}')
+
+    def test_encode_rejects_unknown_types(self):
+        import decimal
+        for v in ({'s': {1, 2}}, [b'abc'], [decimal.Decimal('1.5')]):
+            with self.assertRaises(TypeError):
+                utils.encode(v)
+            with self.assertRaises(TypeError):
+                utils._std_dumps(v)
+
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def round_trip(self, v):
+        return utils.decode(utils.encode(v))
+
+    def test_big_ints(self):
+        for v in ([10 ** 20], {'a': 2 ** 70}, [-(2 ** 64) - 1], [2 ** 64 - 1, -(2 ** 63)]):
+            rs = self.round_trip(v)
+            self.assertEqual(rs, v)
+            self.assertEqual([type(x) for x in (rs.values() if isinstance(rs, dict) else rs)], [int] * len(v))
+
+    def test_nan_and_infinity(self):
+        rs = self.round_trip([float('nan'), float('inf'), {'x': float('-inf')}, None])
+        self.assertTrue(math.isnan(rs[0]))
+        self.assertEqual(rs[1:], [float('inf'), {'x': float('-inf')}, None])
+
+    def test_legacy_stdlib_payloads(self):
+        # 旧版本 json.dumps 写入的 NaN/Infinity
+        rs = utils.decode(json.dumps({'a': float('nan'), 'b': [float('inf'), 1]}))
+        self.assertTrue(math.isnan(rs['a']))
+        self.assertEqual(rs['b'], [float('inf'), 1])
+
+    def test_plain_values(self):
+        v = {'s': '中文', 'n': [1, 2.5, None, True], 'd': {'k': 'null'}}
+        self.assertEqual(self.round_trip(v), v)
+
+
+class NumpyTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy is not installed')
+        self.np = numpy
+
+    def test_top_level_array_is_encoded(self):
+        self.assertEqual(json.loads(utils.encode(self.np.array([1, 2, 3]))), [1, 2, 3])
+        self.assertEqual(json.loads(utils.encode(self.np.zeros((2, 2)))), [[0.0, 0.0], [0.0, 0.0]])
+
+    def test_scalars_become_python_values(self):
+        v = utils.encode(self.np.int64(5))
+        self.assertEqual((type(v), v), (int, 5))
+
+    def test_nested_arrays(self):
+        self.assertEqual(json.loads(utils.encode({'a': self.np.array([1.5])})), {'a': [1.5]})
+        self.assertEqual(json.loads(utils._std_dumps({'a': self.np.array([1.5])})), {'a': [1.5]})
+
+
+class NaiveDatetimeTest(unittest.TestCase):
+
+    def test_naive_datetime_is_not_shifted_to_utc(self):
+        t = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        self.assertEqual(json.loads(utils.encode([t])), ['2024-01-01T12:00:00'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
-import os
+import os, re, functools
 
 SERVER = os.getenv('MONGO_SERVER', 'localhost:27017')
 if not SERVER.startswith('mongodb://'):
     SERVER = f'mongodb://{SERVER}'
 CONN = SERVER.replace('mongodb://', '')
-DB = os.getenv('MONGO_DB') or ('/' in CONN and CONN.split('/')[1]) or os.path.basename(os.getcwd())
+
+
+@functools.lru_cache(maxsize=1)
+def get_db():
+    # 进程内只计算一次，之后 cwd 变化仍返回相同的库名；importlib.reload 会重新创建缓存并重新计算
+    m = re.match(r'mongodb://[^/]+/([^?]+)', SERVER)
+    return os.getenv('MONGO_DB') or (m and m.group(1)) or os.path.basename(os.getcwd())
+
+
+DB = get_db()
 TIMEOUT = 3000
@@ -1,4 +1,14 @@
+import copy, functools, json
 from tablestore import *
+from .utils import TTLCache
+
+# 含 dict 等不可哈希值的查询: 规范化 json -> Query 对象
+_JSON_QUERY_CACHE = TTLCache(maxsize=256, ttl=3600)
+
+# SQL 风格通配符 -> Tablestore 通配符
+_WILDCARD_TABLE = str.maketrans({'%': '*', '_': '?'})
+# 按字面匹配时转义 Tablestore 通配符
+_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '*': '\\*', '?': '\\?'})
 
 def ensure_list(v):
     if v is None:
@@ -7,6 +17,91 @@ def ensure_list(v):
         return list(v)
     return [v]
 
+
+# 各操作符的查询构建函数，返回 (query, is_not)
+def _build_eq(field, value):
+    return TermQuery(field, value), False
+
+def _build_ne(field, value):
+    # ne 用 must_not 实现
+    return TermQuery(field, value), True
+
+def _build_in(field, value):
+    value_list = ensure_list(value)
+    return (TermsQuery(field, value_list) if value_list else None), False
+
+def _build_nin(field, value):
+    value_list = ensure_list(value)
+    return (TermsQuery(field, value_list) if value_list else None), True
+
+def _build_range(include_lower=None, include_upper=None):
+    def build(field, value):
+        return RangeQuery(
+            field_name=field,
+            range_from=value if include_lower is not None else None,
+            range_to=value if include_upper is not None else None,
+            include_lower=bool(include_lower),
+            include_upper=bool(include_upper)
+        ), False
+    return build
+
+def to_wildcard(value):
+    # Tablestore 只支持通配符 * 和 ?，不支持正则
+    return str(value).translate(_WILDCARD_TABLE)
+
+def _build_wildcard(field, value):
+    pattern = to_wildcard(value)
+    if '*' not in pattern and '?' not in pattern:
+        pattern += '*'  # 默认模糊
+    return WildcardQuery(field, pattern), False
+
+def escape_wildcard(value):
+    # 字符串按字面匹配: * ? 转义，% _ 原样保留
+    return str(value).translate(_ESCAPE_TABLE)
+
+def _build_like(field, value):
+    # SQL LIKE: % 和 _ 是通配符
+    return WildcardQuery(field, to_wildcard(value)), False
+
+def _build_contains(field, value):
+    return WildcardQuery(field, f'*{escape_wildcard(value)}*'), False
+
+def _build_startswith(field, value):
+    return WildcardQuery(field, f'{escape_wildcard(value)}*'), False
+
+def _build_endswith(field, value):
+    return WildcardQuery(field, f'*{escape_wildcard(value)}'), False
+
+def _build_exists(field, value):
+    # exists=true 表示存在，false 表示不存在
+    return ExistsQuery(field), value in ['0', 'false', False, 'False']
+
+
+_OP_BUILDERS = {
+    'eq': _build_eq,
+    'ne': _build_ne,
+    'in': _build_in,
+    'nin': _build_nin,
+    'gt': _build_range(include_lower=False),
+    'gte': _build_range(include_lower=True),
+    'lt': _build_range(include_upper=False),
+    'lte': _build_range(include_upper=True),
+    'regex': _build_wildcard,
+    'wildcard': _build_wildcard,
+    'like': _build_like,
+    'contains': _build_contains,
+    'startswith': _build_startswith,
+    'endswith': _build_endswith,
+    'exists': _build_exists,
+}
+
+
+def build_lookup_query(field, op, value):
+    """
+    按操作符构建单个字段的查询，返回 (query, is_not)，未知操作符默认当作 eq 处理
+    """
+    return _OP_BUILDERS.get(op, _build_eq)(field, value)
+
 def build_tablestore_query(data=None, field_types=None, fields=None, search_fields=None):
     """
     将扁平查询参数转换为 Tablestore 多元索引的 Query 对象（BoolQuery）
@@ -19,6 +114,73 @@ def build_tablestore_query(data=None, field_types=None, fields=None, search_fiel
     """
     if not data:
         return MatchAllQuery()
+    # 缓存里的 Query 对象是共用的，返回副本，调用方修改返回值不会影响缓存
+    key = _cache_key(data, field_types, fields, search_fields)
+    if key is not None:
+        return copy.deepcopy(_build_cached(*key))
+    # 转换函数/白名单等参数不可哈希时无法区分缓存项，不缓存
+    args_key = _cache_key({}, field_types, fields, search_fields)
+    if args_key is None:
+        return _build_query(data, field_types, fields, search_fields)
+    # 含不可哈希的值（如 dict），按规范化后的 json 缓存
+    try:
+        jkey = (json.dumps(data, sort_keys=True), args_key)
+    except TypeError:
+        return _build_query(data, field_types, fields, search_fields)
+    query = _JSON_QUERY_CACHE.get(jkey)
+    if query is None:
+        query = _build_query(data, field_types, fields, search_fields)
+        _JSON_QUERY_CACHE.set(jkey, query)
+    return copy.deepcopy(query)
+
+
+def _freeze(v):
+    # 每个值都带上类型（嵌套的 list/dict 逐层处理），1 / True / 1.0 不会共用缓存项
+    t = type(v)
+    if t is list or t is tuple:
+        return t, tuple(_freeze(x) for x in v)
+    if t is dict:
+        return t, tuple(sorted((k, _freeze(x)) for k, x in v.items()))
+    return t, v
+
+
+def _thaw(key):
+    t, v = key
+    if t is list or t is tuple:
+        return t(_thaw(x) for x in v)
+    if t is dict:
+        return {k: _thaw(x) for k, x in v}
+    return v
+
+
+def _cache_key(data, field_types=None, fields=None, search_fields=None):
+    """
+    将查询参数规范化为可哈希的缓存 key，无法哈希时返回 None
+    """
+    try:
+        key = (
+            tuple(sorted((k, _freeze(v)) for k, v in data.items())),
+            tuple(sorted(field_types.items())) if field_types else None,
+            tuple(fields) if fields else None,
+            tuple(search_fields) if search_fields else None,
+        )
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+@functools.lru_cache(maxsize=256)
+def _build_cached(data_key, field_types_key, fields_key, search_fields_key):
+    return _build_query(
+        {k: _thaw(v) for k, v in data_key},
+        dict(field_types_key) if field_types_key else None,
+        fields_key,
+        search_fields_key
+    )
+
+
+def _build_query(data, field_types=None, fields=None, search_fields=None):
     field_types = field_types or {}
     fields = set(fields) if fields else None
     search_fields = search_fields or []
@@ -34,8 +196,7 @@ def build_tablestore_query(data=None, field_types=None, fields=None, search_fiel
             for fn in search_fields:
                 if fields and fn not in fields:
                     continue
-                # Tablestore 只支持通配符 * 和 ?，不支持正则
-                pattern = sv.strip().replace('%', '*').replace('_', '?')
+                pattern = to_wildcard(sv.strip())
                 if not pattern.endswith('*'):
                     pattern += '*'  # 默认前缀匹配
                 should_queries.append(WildcardQuery(fn, pattern))
@@ -46,9 +207,9 @@ def build_tablestore_query(data=None, field_types=None, fields=None, search_fiel
             continue
 
         # 解析字段名和操作符
-        parts = key.split('__')
-        base_field = parts[0]
-        op = parts[-1] if len(parts) > 1 else 'eq'
+        base_field, sep, op = key.rpartition('__')
+        if not sep:
+            base_field, op = key, 'eq'
 
         # 字段白名单检查
         if fields and base_field not in fields:
@@ -70,69 +231,78 @@ def build_tablestore_query(data=None, field_types=None, fields=None, search_fiel
             base_field = base_field[:-4]
 
         # 构建查询
-        query = None
-        if op == 'eq':
-            query = TermQuery(base_field, value)
-        elif op == 'ne':
-            # ne 用 must_not 实现
-            query = TermQuery(base_field, value)
-            is_not = True  # 转为 not
-        elif op == 'in':
-            value_list = ensure_list(value)
-            if value_list:
-                query = TermsQuery(base_field, value_list)
-        elif op == 'nin':
-            value_list = ensure_list(value)
-            if value_list:
-                query = TermsQuery(base_field, value_list)
-                is_not = True
-        elif op in ('gt', 'gte', 'lt', 'lte'):
-            range_from = range_to = None
-            include_lower = include_upper = False
-
-            if op == 'gt':
-                range_from = value
-                include_lower = False
-            elif op == 'gte':
-                range_from = value
-                include_lower = True
-            elif op == 'lt':
-                range_to = value
-                include_upper = False
-            elif op == 'lte':
-                range_to = value
-                include_upper = True
-
-            query = RangeQuery(
-                field_name=base_field,
-                range_from=range_from,
-                range_to=range_to,
-                include_lower=include_lower,
-                include_upper=include_upper
-            )
-        elif op in ('regex', 'wildcard'):
-            pattern = str(value).replace('%', '*').replace('_', '?')
-            if '*' not in pattern and '?' not in pattern:
-                pattern += '*'  # 默认模糊
-            query = WildcardQuery(base_field, pattern)
-        elif op == 'exists':
-            # exists=true 表示存在，false 表示不存在
-            exists_flag = value not in ['0', 'false', False, 'False']
-            query = ExistsQuery(base_field)
-            if not exists_flag:
-                is_not = True
-        else:
-            # 默认当作 eq 处理
-            query = TermQuery(base_field, value)
+        query, op_not = build_lookup_query(base_field, op, value)
+        is_not = is_not or op_not
 
         # 添加到对应列表
-        if query:
+        if query is not None:
             if is_not:
                 must_not_queries.append(query)
             else:
                 must_queries.append(query)
 
-    # 3. 组合查询
+    # 3. 组合查询：展开嵌套的同类 BoolQuery 并去掉重复子句
+    return combine_bool_query(must_queries, should_queries, must_not_queries)
+
+
+def _canon(query):
+    """
+    返回描述查询的可哈希 key，用于子句去重
+    """
+    if isinstance(query, BoolQuery):
+        return (
+            'bool',
+            tuple(_canon(q) for q in query.must_queries),
+            tuple(_canon(q) for q in query.must_not_queries),
+            tuple(_canon(q) for q in query.filter_queries),
+            tuple(_canon(q) for q in query.should_queries),
+            query.minimum_should_match,
+            query.weight
+        )
+    # 每个属性带上值的类型，TermQuery('f', 1) 与 TermQuery('f', True) 不会被当成重复
+    return (type(query).__name__, repr(sorted((k, type(v).__name__, v) for k, v in vars(query).items())))
+
+
+_BOOL_CLAUSES = ('must_queries', 'must_not_queries', 'filter_queries', 'should_queries')
+
+
+def _only_clause(query, clause):
+    """
+    BoolQuery 只填充了 clause 一种子句时返回其子查询列表，否则返回 None
+    """
+    if not isinstance(query, BoolQuery) or query.weight is not None:
+        return None
+    if any(getattr(query, c) for c in _BOOL_CLAUSES if c != clause):
+        return None
+    if clause == 'should_queries' and (query.minimum_should_match or 1) > 1:
+        return None
+    return getattr(query, clause) or None
+
+
+def _flatten(queries, clause):
+    for q in queries:
+        children = _only_clause(q, clause)
+        if children:
+            yield from _flatten(children, clause)
+        else:
+            yield q
+
+
+def _dedupe(queries):
+    return list(dict((_canon(q), q) for q in queries).values())
+
+
+def combine_bool_query(must_queries=None, should_queries=None, must_not_queries=None):
+    """
+    组合子查询为 BoolQuery，并做以下化简：
+    - 去掉重复的子句
+    - 将只含 must（或 should）的嵌套 BoolQuery 展开到父级对应子句中
+    - 只剩一个 must 或 should 子查询时直接返回该子查询
+    """
+    must_queries = _dedupe(_flatten(must_queries or [], 'must_queries'))
+    should_queries = _dedupe(_flatten(should_queries or [], 'should_queries'))
+    must_not_queries = _dedupe(must_not_queries or [])
+
     bool_clauses = {}
     if must_queries:
         bool_clauses['must_queries'] = must_queries
@@ -144,8 +314,7 @@ def build_tablestore_query(data=None, field_types=None, fields=None, search_fiel
 
     if not bool_clauses:
         return MatchAllQuery()
-    elif len(bool_clauses) == 1 and 'must' in bool_clauses and len(must_queries) == 1 and not should_queries and not must_not_queries:
-        # 只有一个 must 查询，直接返回
-        return must_queries[0]
-    else:
-        return BoolQuery(**bool_clauses)
\ No newline at end of file
+    if not must_not_queries and len(must_queries) + len(should_queries) == 1:
+        # 只有一个 must 或 should 查询，直接返回
+        return (must_queries or should_queries)[0]
+    return BoolQuery(**bool_clauses)
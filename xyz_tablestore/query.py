@@ -26,8 +26,139 @@ TableStore QuerySet - Django ORM 风格的查询接口
 """
 
 from typing import Any, List, Dict, Optional, Union, Tuple
-from copy import deepcopy
 import operator
+import re
+import sys
+from itertools import islice
+from functools import cmp_to_key
+from tablestore import ComparatorType, INF_MIN, INF_MAX, Direction
+from tablestore import SearchQuery, Sort, FieldSort, SortOrder, ColumnsToGet, ColumnReturnType
+from tablestore import Row, PutRowItem, DeleteRowItem, Condition, RowExistenceExpectation
+from tablestore import BoolQuery, MatchAllQuery, OTSClientError, OTSServiceError
+from .lookup import build_lookup_query, combine_bool_query, ensure_list
+from .utils import batch_write_rows, TTLCache
+
+
+# 可下推到 TableStore 列条件的查询操作符
+_COMPARATORS = {
+    'exact': ComparatorType.EQUAL,
+    'gt': ComparatorType.GREATER_THAN,
+    'gte': ComparatorType.GREATER_EQUAL,
+    'lt': ComparatorType.LESS_THAN,
+    'lte': ComparatorType.LESS_EQUAL,
+}
+
+# 可下推为列条件的操作符
+_PUSHDOWN_LOOKUPS = frozenset(_COMPARATORS)
+
+# 可转换为多元索引查询的操作符 -> lookup.py 中的操作符
+_SEARCH_LOOKUPS = {
+    'exact': 'eq',
+    'gt': 'gt',
+    'gte': 'gte',
+    'lt': 'lt',
+    'lte': 'lte',
+    'in': 'in',
+    'contains': 'contains',
+    'startswith': 'startswith',
+    'endswith': 'endswith',
+}
+
+# 范围扫描时只能在内存中过滤, 但可通过多元索引通配符查询下推的操作符
+_WILDCARD_LOOKUPS = frozenset(['contains', 'startswith', 'endswith'])
+
+# 多元索引单次请求最多返回的行数
+SEARCH_PAGE_SIZE = 100
+
+# (表名, 索引名) -> 多元索引是否存在; 索引可能之后才创建, 结果只缓存一段时间
+_SEARCH_INDEX_CACHE = TTLCache(maxsize=256, ttl=300)
+
+
+_FILTER_KEY_RE = re.compile(r'^(not_)?(.+?)(?:__(exact|gt|gte|lt|lte|contains|startswith|endswith|in))?$')
+
+
+def _parse_filter_key(filter_key):
+    """解析过滤键为 (是否取反, 字段名, 操作符)"""
+    m = _FILTER_KEY_RE.match(filter_key)
+    if m[3] is None and '__' in m[2]:
+        # 如 name__iexact: 不支持的操作符不能当成对 "name__iexact" 列的精确匹配
+        raise ValueError(f"Unsupported lookup '{m[2].rpartition('__')[2]}' in filter '{filter_key}'")
+    # 字段名驻留, 后续 getattr/实例字典查找可直接按指针比较
+    return bool(m[1]), sys.intern(m[2]), m[3] or 'exact'
+
+
+# 字符串操作符: 通用版本先做 str() 转换, 字段值本身是 str 时使用免转换的版本
+# 缺失的列取值为 None, 不参与字符串匹配
+def _contains_generic(a, b):
+    return a is not None and b in str(a)
+
+def _startswith_generic(a, b):
+    return a is not None and str(a).startswith(b)
+
+def _endswith_generic(a, b):
+    return a is not None and str(a).endswith(b)
+
+# 免转换的版本只按第一行的类型选用, 其他行的值不是 str 时仍走通用版本, 结果与通用版本一致
+def _contains_str(a, b):
+    return b in a if type(a) is str else _contains_generic(a, b)
+
+def _startswith_str(a, b):
+    return a.startswith(b) if type(a) is str else _startswith_generic(a, b)
+
+def _endswith_str(a, b):
+    return a.endswith(b) if type(a) is str else _endswith_generic(a, b)
+
+
+_STR_OPERATORS = {
+    'contains': _contains_str,
+    'startswith': _startswith_str,
+    'endswith': _endswith_str,
+}
+
+
+def _sort_value(v):
+    # None 排在所有值之前, 且不与其他类型的值直接比较
+    return (False, 0) if v is None else (True, v)
+
+
+def _desc_sort_value(v):
+    # 数值降序: 取负, None 排在最后
+    return (True, 0) if v is None else (False, -v)
+
+
+def _compare(keys, a, b):
+    """按 [(getter, reverse), ...] 逐字段比较两个对象"""
+    for getter, reverse in keys:
+        x, y = _sort_value(getter(a)), _sort_value(getter(b))
+        if x != y:
+            r = -1 if x < y else 1
+            return -r if reverse else r
+    return 0
+
+
+def _filter_key(item):
+    """过滤条件的去重 key, 带上值的类型 (1 / True / 1.0 互不相同), 值不可哈希时（如 list）退化为 repr"""
+    field_name, lookup, value, is_negated = item
+    key = (field_name, lookup, type(value), value, is_negated)
+    try:
+        hash(key)
+        return key
+    except TypeError:
+        return field_name, lookup, type(value), repr(value), is_negated
+
+
+def _predicate(field_name, op_func, value, is_negated):
+    """构建单个过滤条件的判断函数
+
+    缺失的列按 None 比较; 比较出错的行视为条件不成立, 因此 exclude() 会保留这些行
+    """
+    def match(obj):
+        try:
+            matched = bool(op_func(getattr(obj, field_name, None), value))
+        except (TypeError, AttributeError):
+            matched = False
+        return is_negated != matched
+    return match
 
 
 class Field:
@@ -52,26 +183,35 @@ class QuerySet:
         'gte': operator.ge,
         'lt': operator.lt,
         'lte': operator.le,
-        'contains': lambda a, b: b in str(a),
-        'startswith': lambda a, b: str(a).startswith(b),
-        'endswith': lambda a, b: str(a).endswith(b),
+        'contains': _contains_generic,
+        'startswith': _startswith_generic,
+        'endswith': _endswith_generic,
         'in': lambda a, b: a in b,
     }
 
     def __init__(self, model_class, client=None):
         self.model_class = model_class
         self.client = client
-        self._filters = []
+        # 过滤条件在 filter()/exclude() 时解析一次, 按能否下推为列条件分开存放,
+        # 每项为 (field_name, lookup, value, is_negated); 以条件本身为 key, 重复的条件只保留一个
+        self._pushdown_filters = {}
+        self._memory_filters = {}
         self._order_by = []
         self._limit = None
         self._offset = 0
         self._cache = None
+        self._iterator = None
         self._fetched = False
 
     def _clone(self):
-        """克隆 QuerySet"""
+        """克隆 QuerySet
+
+        只做浅拷贝：过滤条件和排序字段在追加后不会被原地修改,
+        链式调用总是在克隆上追加新条目, 因此无需 deepcopy
+        """
         clone = QuerySet(self.model_class, self.client)
-        clone._filters = self._filters.copy()
+        clone._pushdown_filters = self._pushdown_filters.copy()
+        clone._memory_filters = self._memory_filters.copy()
         clone._order_by = self._order_by.copy()
         clone._limit = self._limit
         clone._offset = self._offset
@@ -97,16 +237,30 @@ class QuerySet:
         """
         clone = self._clone()
         for key, value in kwargs.items():
-            clone._filters.append((key, value))
+            clone._add_filter(key, value)
         return clone
 
     def exclude(self, **kwargs):
         """排除查询"""
         clone = self._clone()
         for key, value in kwargs.items():
-            clone._filters.append((f'not_{key}', value))
+            clone._add_filter(f'not_{key}', value)
         return clone
 
+    def _add_filter(self, filter_key, value):
+        is_negated, field_name, lookup = _parse_filter_key(filter_key)
+        item = (field_name, lookup, value, is_negated)
+        key = _filter_key(item)
+        if lookup in _PUSHDOWN_LOOKUPS and not is_negated:
+            self._pushdown_filters[key] = item
+        else:
+            # 取反及其他复杂条件需要在内存中过滤
+            self._memory_filters[key] = item
+
+    def _iter_filters(self):
+        yield from self._pushdown_filters.values()
+        yield from self._memory_filters.values()
+
     def order_by(self, *fields):
         """排序
 
@@ -120,7 +274,10 @@ class QuerySet:
 
     def get(self, **kwargs):
         """获取单个对象"""
-        results = list(self.filter(**kwargs))
+        # 只需取 2 行即可区分 0 / 1 / 多个
+        clone = self.filter(**kwargs)
+        clone._limit = 2 if clone._limit is None else min(clone._limit, 2)
+        results = list(clone)
         if len(results) == 0:
             raise self.model_class.DoesNotExist(
                 f"{self.model_class.__name__} matching query does not exist"
@@ -133,8 +290,7 @@ class QuerySet:
 
     def first(self):
         """获取第一个对象"""
-        results = list(self[:1])
-        return results[0] if results else None
+        return next(iter(self[:1]), None)
 
     def last(self):
         """获取最后一个对象"""
@@ -142,12 +298,32 @@ class QuerySet:
         return results[-1] if results else None
 
     def count(self):
-        """计数"""
-        return len(list(self))
+        """计数
+
+        条件能转换为多元索引查询时直接使用 total_count, 不读取数据行
+        """
+        if self._fetched:
+            return len(self._cache)
+        if self._matches_nothing():
+            return 0
+        query = self._build_search_query()
+        if query is None:
+            return len(self._fetch())
+        total = max(self._search(query, limit=0, get_total_count=True).total_count - self._offset, 0)
+        if self._limit is not None:
+            total = min(total, self._limit)
+        return total
 
     def exists(self):
         """检查是否存在"""
-        return self.count() > 0
+        if self._fetched:
+            return bool(self._cache)
+        if self._matches_nothing():
+            return False
+        query = self._build_search_query()
+        if query is None:
+            return next(iter(self), None) is not None
+        return len(self._search(query, offset=self._offset, limit=1, columns=ColumnReturnType.NONE).rows) > 0
 
     def all(self):
         """获取所有对象"""
@@ -169,123 +345,237 @@ class QuerySet:
                 return results[key]
             clone._offset = key
             clone._limit = 1
-            results = list(clone)
-            return results[0] if results else None
+            return next(iter(clone), None)
         return clone
 
     def _fetch(self):
-        """从 TableStore 获取数据"""
-        if self._fetched:
-            return self._cache
-
-        if not self.client:
-            raise ValueError("Client not set. Use Model.objects.client = client")
-
-        # 这里需要根据实际的 TableStore API 来实现
-        # 以下是模拟实现
-        self._cache = self._fetch_from_tablestore()
-        self._fetched = True
+        """从 TableStore 获取全部数据"""
+        if not self._fetched:
+            for _ in self._iter_cached():
+                pass
         return self._cache
 
+    def _iter_cached(self):
+        """边获取边缓存, 提前结束迭代时不会读取剩余的数据"""
+        if self._iterator is None:
+            if not self.client:
+                raise ValueError("Client not set. Use Model.objects.client = client")
+            self._cache = []
+            self._iterator = self._fetch_from_tablestore()
+
+        i = 0
+        while True:
+            if i < len(self._cache):
+                yield self._cache[i]
+                i += 1
+                continue
+            if self._fetched:
+                return
+            try:
+                obj = next(self._iterator)
+            except StopIteration:
+                self._fetched = True
+                return
+            self._cache.append(obj)
+
     def _fetch_from_tablestore(self):
         """从 TableStore 获取数据的实际实现
 
-        注意: 这是一个简化的实现框架
-        实际使用时需要根据 TableStore 的 API 来调整
+        - 无排序或按主键排序: 走 get_range, 扫描方向和所需行数下推到服务端
+        - 按其他字段排序, 或包含 contains/startswith/endswith 条件:
+          表有多元索引且条件都能转换为多元索引查询时走 search, 由服务端过滤、排序和分页
+        - 其余情况: 全量范围扫描后在内存中过滤、排序
         """
-        from tablestore import INF_MIN, INF_MAX
-        from tablestore import Direction, ColumnCondition, CompositeColumnCondition, LogicalOperator
+        if self._matches_nothing():
+            return
+        direction = self._range_direction()
+        if direction is None or self._has_wildcard_filters():
+            query = self._build_search_query()
+            if query is not None:
+                yield from self._fetch_by_search(query)
+                return
+
+        stop = self._offset + self._limit if self._limit is not None else None
+        if direction is not None:
+            # 排序已由扫描方向保证, 只需取到 offset + limit 行
+            results = self._fetch_by_range(direction, stop)
+        else:
+            # 应用排序
+            results = self._apply_ordering(self._fetch_by_range(Direction.FORWARD))
 
-        table_name = self.model_class._meta['table_name']
-        primary_keys = self.model_class._meta['primary_keys']
+        # 应用分页
+        yield from islice(results, self._offset, stop)
+
+    def _matches_nothing(self):
+        """存在 filter(x__in=[]) 这类不可能满足的条件时, 无需请求即可知道结果为空"""
+        for field_name, lookup, value, is_negated in self._memory_filters.values():
+            if lookup == 'in' and not is_negated and not ensure_list(value):
+                return True
+        return False
+
+    def _has_wildcard_filters(self):
+        for field_name, lookup, value, is_negated in self._memory_filters.values():
+            if lookup in _WILDCARD_LOOKUPS:
+                return True
+        return False
+
+    def _range_direction(self):
+        """排序可由主键范围扫描直接满足时返回扫描方向, 否则返回 None"""
+        if not self._order_by:
+            return Direction.FORWARD
+        primary_keys = self.model_class._primary_keys
+        if len(self._order_by) > len(primary_keys):
+            return None
+        reverse = self._order_by[0].startswith('-')
+        for field, pk in zip(self._order_by, primary_keys):
+            if field.startswith('-') != reverse or field.lstrip('-') != pk:
+                return None
+        return Direction.BACKWARD if reverse else Direction.FORWARD
+
+    def _to_instance(self, row):
+        """将 TableStore 返回的行转换为模型实例"""
+        primary_key, attributes = row if isinstance(row, tuple) else (row.primary_key, row.attribute_columns)
+        values = dict(primary_key)
+        for attr in attributes:
+            values[attr[0]] = attr[1]
+
+        instance = self.model_class()
+        slot_names = self.model_class._slot_names
+        extra = {}
+        for name, value in values.items():
+            if name in slot_names:
+                setattr(instance, name, value)
+            else:
+                extra[name] = value
+        if extra:
+            # 未声明的列一次性写入实例字典
+            instance.__dict__.update(extra)
+        return instance
+
+    def _fetch_by_range(self, direction, fetch_limit=None):
+        """主键范围扫描, 逐页生成匹配的实例, 已匹配 fetch_limit 行时提前结束"""
+        table_name = self.model_class._table_name
+        primary_keys = self.model_class._primary_keys
 
         # 构建主键范围
-        # 注意: TableStore 的查询需要指定主键范围
-        # 这里简化处理,实际应用需要更复杂的逻辑
-        inclusive_start_primary_key = [(pk, INF_MIN) for pk in primary_keys]
-        exclusive_end_primary_key = [(pk, INF_MAX) for pk in primary_keys]
+        start_primary_key = [(pk, INF_MIN) for pk in primary_keys]
+        end_primary_key = [(pk, INF_MAX) for pk in primary_keys]
+        if direction == Direction.BACKWARD:
+            start_primary_key, end_primary_key = end_primary_key, start_primary_key
 
         # 构建列条件
         column_condition = self._build_column_condition()
 
-        # 执行范围查询
-        consumed, next_start_primary_key, row_list, next_token = self.client.get_range(
-            table_name,
-            Direction.FORWARD,
-            inclusive_start_primary_key,
-            exclusive_end_primary_key,
-            columns_to_get=[],  # 获取所有列
-            limit=None,
-            column_filter=column_condition,
-            max_version=1
-        )
-
-        # 转换为模型实例
-        results = []
-        for primary_key, attributes in row_list:
-            instance = self.model_class()
-
-            # 设置主键
-            for pk_name, pk_value in primary_key:
-                setattr(instance, pk_name, pk_value)
-
-            # 设置属性
-            for attr_name, attr_value, _ in attributes:
-                setattr(instance, attr_name, attr_value)
-
-            results.append(instance)
+        matched = 0
+        while start_primary_key:
+            consumed, start_primary_key, row_list, next_token = self.client.get_range(
+                table_name,
+                direction,
+                start_primary_key,
+                end_primary_key,
+                columns_to_get=[],  # 获取所有列
+                limit=fetch_limit - matched if fetch_limit is not None else None,
+                column_filter=column_condition,
+                max_version=1
+            )
 
-        # 应用内存过滤
-        results = self._apply_filters(results)
+            # 转换为模型实例并应用内存过滤
+            results = self._apply_filters([self._to_instance(row) for row in row_list])
+            matched += len(results)
+            yield from results
+            if fetch_limit is not None and matched >= fetch_limit:
+                return
+
+    def _has_search_index(self):
+        """表是否有 Meta.index_name 指定的多元索引, index_name 为 None 时不使用多元索引"""
+        table_name = self.model_class._table_name
+        index_name = self.model_class._index_name
+        if not index_name:
+            return False
+        key = (table_name, index_name)
+        exists = _SEARCH_INDEX_CACHE.get(key)
+        if exists is None:
+            try:
+                indexes = self.client.list_search_index(table_name)
+            except (OTSClientError, OTSServiceError):
+                # 查不到索引信息时本次退回到范围扫描, 不缓存结果
+                return False
+            exists = any(name == index_name for table, name in indexes)
+            _SEARCH_INDEX_CACHE.set(key, exists)
+        return exists
+
+    def _build_search_query(self):
+        """将过滤条件转换为多元索引查询, 没有多元索引或存在无法转换的条件时返回 None"""
+        if not self._has_search_index():
+            return None
+        must_queries = []
+        must_not_queries = []
+        for field_name, lookup, value, is_negated in self._iter_filters():
+            op = _SEARCH_LOOKUPS.get(lookup)
+            if op is None:
+                return None
+
+            query, is_not = build_lookup_query(field_name, op, value)
+            if query is None:
+                if is_not == is_negated:
+                    # 如 filter(x__in=[]): 必须满足的条件为空, 不匹配任何行
+                    must_queries.append(BoolQuery(must_not_queries=[MatchAllQuery()]))
+                continue
+            if is_not != is_negated:
+                must_not_queries.append(query)
+            else:
+                must_queries.append(query)
 
-        # 应用排序
-        results = self._apply_ordering(results)
+        return combine_bool_query(must_queries, must_not_queries=must_not_queries)
 
-        # 应用分页
-        if self._offset:
-            results = results[self._offset:]
-        if self._limit is not None:
-            results = results[:self._limit]
+    def _get_sort(self):
+        if not self._order_by:
+            return None
+        return Sort(sorters=[
+            FieldSort(f[1:], SortOrder.DESC) if f.startswith('-') else FieldSort(f, SortOrder.ASC)
+            for f in self._order_by
+        ])
+
+    def _search(self, query, columns=ColumnReturnType.ALL, **kwargs):
+        """执行单次多元索引查询"""
+        return self.client.search(
+            self.model_class._table_name,
+            self.model_class._index_name,
+            SearchQuery(query, **kwargs),
+            columns_to_get=ColumnsToGet(return_type=columns)
+        )
 
-        return results
+    def _fetch_by_search(self, query):
+        """通过多元索引查询, 排序和分页由服务端完成, 逐页生成实例"""
+        sort = self._get_sort()
+        offset, next_token = self._offset, None
+        fetched = 0
+        while True:
+            limit = SEARCH_PAGE_SIZE
+            if self._limit is not None:
+                limit = min(self._limit - fetched, SEARCH_PAGE_SIZE)
+            rs = self._search(query, sort=sort, offset=offset, next_token=next_token, limit=limit)
+            fetched += len(rs.rows)
+            for row in rs.rows:
+                yield self._to_instance(row)
+            if not rs.next_token or (self._limit is not None and fetched >= self._limit):
+                return
+            offset, next_token = None, rs.next_token
 
     def _build_column_condition(self):
         """构建列条件"""
-        if not self._filters:
+        if not self._pushdown_filters:
             return None
 
         from tablestore import ColumnCondition, CompositeColumnCondition, LogicalOperator
-        from tablestore import SingleColumnCondition, ComparatorType
+        from tablestore import SingleColumnCondition
 
         conditions = []
-        for filter_key, value in self._filters:
-            # 解析过滤键
-            if '__' in filter_key:
-                field_name, lookup = filter_key.rsplit('__', 1)
-            else:
-                field_name, lookup = filter_key, 'exact'
-
+        for field_name, lookup, value, is_negated in self._pushdown_filters.values():
             # 映射到 TableStore 的比较类型
-            if lookup == 'exact':
-                comparator = ComparatorType.EQUAL
-            elif lookup == 'gt':
-                comparator = ComparatorType.GREATER_THAN
-            elif lookup == 'gte':
-                comparator = ComparatorType.GREATER_EQUAL
-            elif lookup == 'lt':
-                comparator = ComparatorType.LESS_THAN
-            elif lookup == 'lte':
-                comparator = ComparatorType.LESS_EQUAL
-            else:
-                # 其他复杂条件需要在内存中过滤
-                continue
-
-            condition = SingleColumnCondition(field_name, value, comparator, pass_if_missing=False)
+            condition = SingleColumnCondition(field_name, value, _COMPARATORS[lookup], pass_if_missing=False)
             conditions.append(condition)
 
-        if not conditions:
-            return None
-
         if len(conditions) == 1:
             return conditions[0]
 
@@ -296,62 +586,74 @@ class QuerySet:
         return composite
 
     def _apply_filters(self, results):
-        """在内存中应用过滤条件"""
-        for filter_key, value in self._filters:
-            is_negated = filter_key.startswith('not_')
-            if is_negated:
-                filter_key = filter_key[4:]
-
-            if '__' in filter_key:
-                field_name, lookup = filter_key.rsplit('__', 1)
-            else:
-                field_name, lookup = filter_key, 'exact'
-
-            if lookup not in self.OPERATORS:
+        """在内存中应用无法下推的过滤条件"""
+        predicates = []
+        for field_name, lookup, value, is_negated in self._memory_filters.values():
+            op_func = self.OPERATORS.get(lookup)
+            if op_func is None:
                 continue
 
-            op_func = self.OPERATORS[lookup]
-            filtered = []
-            for obj in results:
-                field_value = getattr(obj, field_name, None)
-                try:
-                    match = op_func(field_value, value)
-                    if is_negated:
-                        match = not match
-                    if match:
-                        filtered.append(obj)
-                except (TypeError, AttributeError):
-                    continue
-            results = filtered
+            if lookup in _STR_OPERATORS and results and isinstance(getattr(results[0], field_name, None), str):
+                # 以第一行的字段类型为准, 字符串字段跳过 str() 转换
+                op_func = _STR_OPERATORS[lookup]
 
-        return results
+            predicates.append(_predicate(field_name, op_func, value, is_negated))
+
+        if not predicates:
+            return results
+        return [obj for obj in results if all(p(obj) for p in predicates)]
 
     def _apply_ordering(self, results):
-        """应用排序"""
+        """应用排序
+
+        所有排序字段合成一个复合 key, 只原地排序一次
+        """
         if not self._order_by:
             return results
 
-        for field in reversed(self._order_by):
-            reverse = field.startswith('-')
-            field_name = field[1:] if reverse else field
-            results = sorted(
-                results,
-                key=lambda obj: getattr(obj, field_name, None) or '',
-                reverse=reverse
-            )
+        names = [f.lstrip('-') for f in self._order_by]
+        keys = [(operator.attrgetter(name), f.startswith('-')) for name, f in zip(names, self._order_by)]
+        results = list(results)
 
+        # 缺失的排序字段先用字段默认值补齐, 排序 key 不再需要 getattr 默认值
+        fields = self.model_class._fields
+        for name in names:
+            default = fields[name].default if name in fields else None
+            for obj in results:
+                if not hasattr(obj, name):
+                    setattr(obj, name, default)
+        has_none = any(getattr(obj, name) is None for obj in results for name in names)
+
+        reverse = keys[0][1]
+        if all(rev == reverse for getter, rev in keys):
+            if has_none:
+                results.sort(key=lambda obj: tuple(_sort_value(getter(obj)) for getter, rev in keys), reverse=reverse)
+            else:
+                results.sort(key=operator.attrgetter(*names), reverse=reverse)
+            return results
+
+        try:
+            # 方向不一致时, 降序的数值字段取负
+            results.sort(key=lambda obj: tuple(
+                _desc_sort_value(getter(obj)) if rev else _sort_value(getter(obj)) for getter, rev in keys
+            ))
+        except TypeError:
+            # 降序字段不是数值, 退化为逐字段比较
+            results.sort(key=cmp_to_key(lambda a, b: _compare(keys, a, b)))
         return results
 
     def __iter__(self):
-        """迭代器"""
-        return iter(self._fetch())
+        """迭代器, 按需从 TableStore 读取"""
+        if self._fetched:
+            return iter(self._cache)
+        return self._iter_cached()
 
     def __len__(self):
         """长度"""
         return len(self._fetch())
 
     def __repr__(self):
-        return f"<QuerySet [{', '.join(repr(obj) for obj in self._fetch()[:5])}]>"
+        return f"<QuerySet [{', '.join(repr(obj) for obj in islice(self, 5))}]>"
 
 
 class Manager:
@@ -375,23 +677,47 @@ class TableStoreModelMeta(type):
         fields = {}
         for key, value in list(attrs.items()):
             if isinstance(value, Field):
+                value.name = key
                 fields[key] = value
 
         # 添加 Meta 信息
         meta = attrs.get('Meta')
         if meta:
+            table_name = getattr(meta, 'table_name', name.lower())
             attrs['_meta'] = {
-                'table_name': getattr(meta, 'table_name', name.lower()),
+                'table_name': table_name,
                 'primary_keys': getattr(meta, 'primary_keys', ['id']),
+                'index_name': getattr(meta, 'index_name', f'{table_name}_index'),
             }
         else:
             attrs['_meta'] = {
                 'table_name': name.lower(),
                 'primary_keys': ['id'],
+                'index_name': f'{name.lower()}_index',
             }
 
         attrs['_fields'] = fields
 
+        # 预先计算常用的 Meta 信息, 避免热路径上反复查字典
+        primary_keys = tuple(attrs['_meta']['primary_keys'])
+        attrs['_table_name'] = attrs['_meta']['table_name']
+        attrs['_index_name'] = attrs['_meta']['index_name']
+        attrs['_primary_keys'] = primary_keys
+        attrs['_non_pk_fields'] = tuple(f for f in fields if f not in primary_keys)
+
+        # 字段和主键存放在 __slots__ 中以减少每个实例的内存占用;
+        # 基类额外保留 __dict__, 未声明的列仍可写入实例
+        parent_slots = frozenset().union(*(getattr(b, '_slot_names', ()) for b in bases))
+        if '__slots__' not in attrs:
+            names = [n for n in dict.fromkeys((*fields, *primary_keys)) if n not in parent_slots]
+            if not any(isinstance(b, TableStoreModelMeta) for b in bases):
+                names.append('__dict__')
+            attrs['__slots__'] = tuple(names)
+        for key in fields:
+            # 类属性会遮蔽同名的 slot
+            attrs.pop(key)
+        attrs['_slot_names'] = parent_slots | frozenset(n for n in attrs['__slots__'] if n != '__dict__')
+
         # 添加管理器
         if 'objects' not in attrs:
             attrs['objects'] = Manager()
@@ -409,47 +735,69 @@ class TableStoreModel(metaclass=TableStoreModelMeta):
     objects = Manager()
 
     def __init__(self, **kwargs):
+        # 先填充字段默认值, 保证按字段取值时实例属性总是存在
+        for key, field in self._fields.items():
+            setattr(self, key, field.default)
         for key, value in kwargs.items():
             setattr(self, key, value)
 
-    def save(self):
-        """保存到 TableStore"""
-        if not self.objects.client:
+    @classmethod
+    def _get_client(cls):
+        client = cls.objects.client
+        if not client:
             raise ValueError("Client not set")
+        return client
 
-        table_name = self._meta['table_name']
-        primary_keys = self._meta['primary_keys']
-
-        # 构建主键
-        pk_list = [(pk, getattr(self, pk)) for pk in primary_keys]
+    def _primary_key(self):
+        return [(pk, getattr(self, pk)) for pk in self._primary_keys]
 
+    def _to_row(self):
         # 构建属性列
         attribute_columns = []
-        for field_name, field in self._fields.items():
-            if field_name not in primary_keys:
-                value = getattr(self, field_name, field.default)
-                if value is not None:
-                    attribute_columns.append((field_name, value))
+        for field_name in self._non_pk_fields:
+            value = getattr(self, field_name)
+            if value is not None:
+                attribute_columns.append((field_name, value))
+        return Row(self._primary_key(), attribute_columns)
 
-        # 写入
-        row = (pk_list, attribute_columns)
-        self.objects.client.put_row(table_name, row)
+    def save(self):
+        """保存到 TableStore"""
+        self._get_client().put_row(self._table_name, self._to_row())
 
     def delete(self):
         """从 TableStore 删除"""
-        if not self.objects.client:
-            raise ValueError("Client not set")
+        self._get_client().delete_row(self._table_name, Row(self._primary_key()), None)
 
-        table_name = self._meta['table_name']
-        primary_keys = self._meta['primary_keys']
+    @classmethod
+    def bulk_save(cls, instances):
+        """通过 batch_write_row 批量保存, 每批最多 200 行, 同一批内的写入顺序不做保证
 
-        pk_list = [(pk, getattr(self, pk)) for pk in primary_keys]
-        self.objects.client.delete_row(table_name, pk_list, None)
+        返回重试后仍失败的子操作
+        """
+        condition = Condition(RowExistenceExpectation.IGNORE)
+        return batch_write_rows(
+            cls._get_client(),
+            cls._table_name,
+            [PutRowItem(inst._to_row(), condition) for inst in instances]
+        )
+
+    @classmethod
+    def bulk_delete(cls, instances):
+        """通过 batch_write_row 批量删除, 每批最多 200 行
+
+        返回重试后仍失败的子操作
+        """
+        condition = Condition(RowExistenceExpectation.IGNORE)
+        return batch_write_rows(
+            cls._get_client(),
+            cls._table_name,
+            [DeleteRowItem(Row(inst._primary_key()), condition) for inst in instances]
+        )
 
     def __repr__(self):
         pk_values = ', '.join(
             f"{pk}={getattr(self, pk, None)}"
-            for pk in self._meta['primary_keys']
+            for pk in self._primary_keys
         )
         return f"<{self.__class__.__name__}: {pk_values}>"
 
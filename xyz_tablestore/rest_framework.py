@@ -1,10 +1,17 @@
+import functools
+from collections import OrderedDict
+from itertools import islice
 from .schema import Schema
+from .utils import TTLCache, json_dumps
+from tablestore import OTSServiceError
 
 from django.utils.functional import cached_property
 from django.core.paginator import Paginator
 from django.dispatch import Signal
+from django.http import HttpResponse
 
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param, remove_query_param
 from rest_framework import permissions, exceptions
 from rest_framework import viewsets, response, serializers, fields
 from django_filters.rest_framework.backends import DjangoFilterBackend
@@ -17,22 +24,142 @@ class MongoPaginator(Paginator):
         return self.object_list.count()
 
 
+class PrecountedMongoPaginator(Paginator):
+    """
+    可以直接传入已知的总数，避免每次分页都对结果做一次 count
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super(PrecountedMongoPaginator, self).__init__(object_list, per_page, **kwargs)
+        self._external_count = count
+
+    @cached_property
+    def count(self):
+        if self._external_count is not None:
+            return self._external_count
+        # 无过滤条件时用元数据里的估算总数，不必扫描
+        estimated = getattr(self.object_list, 'estimated_document_count', None)
+        if estimated and not getattr(self.object_list, 'query', None):
+            return estimated()
+        return self.object_list.count()
+
+
+# 列表页总数缓存: (请求路径, 查询参数(不含页码), 用户, 过滤后的查询及表的写入代数) -> count
+_PAGE_COUNT_CACHE = TTLCache(maxsize=1024)
+
+
 class MongoPageNumberPagination(PageNumberPagination):
-    django_paginator_class = MongoPaginator
+    django_paginator_class = PrecountedMongoPaginator
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
+    count_cache_ttl = 60
+    # 带上该参数（如 ?_nocount=1）时不统计总数，只返回 next/previous 链接
+    no_count_query_param = '_nocount'
+    has_count = True
+
+    def get_count_cache_key(self, request, view=None):
+        """
+        同一路径和参数下，不同用户经 filter_query 限定后的查询可能不同，总数不能共用；
+        带上 store 的 count key（含表的写入代数），本进程内有写入后缓存自动失效
+        """
+        params = sorted((k, v) for k, v in request.query_params.lists() if k != self.page_query_param)
+        user = getattr(getattr(request, 'user', None), 'pk', None)
+        store = getattr(view, 'store', None)
+        scope = store._count_key(getattr(view, 'resolved_query', None) or {}) if store is not None else None
+        return (request.path, repr(params), user, scope)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.no_count_query_param):
+            return self.paginate_without_count(queryset, request)
+        key = self.get_count_cache_key(request, view)
+        count = _PAGE_COUNT_CACHE.get(key)
+        self.django_paginator_class = functools.partial(PrecountedMongoPaginator, count=count)
+        page = super(MongoPageNumberPagination, self).paginate_queryset(queryset, request, view=view)
+        if count is None and page is not None:
+            _PAGE_COUNT_CACHE.set(key, self.page.paginator.count, self.count_cache_ttl)
+        return page
+
+    def paginate_without_count(self, queryset, request):
+        """
+        多取一条判断是否还有下一页，不需要 count
+        """
+        self.request = request
+        self.has_count = False
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except ValueError:
+            self.page_number = 1
+        start = (self.page_number - 1) * page_size
+        rows = list(islice(queryset, start, start + page_size + 1))
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
 
+    def get_paginated_response(self, data):
+        if self.has_count:
+            return super(MongoPageNumberPagination, self).get_paginated_response(data)
+        return response.Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
 
-def get_paginated_response(view, query, wrap=lambda a: a):
+    def get_next_link(self):
+        if self.has_count:
+            return super(MongoPageNumberPagination, self).get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.has_count:
+            return super(MongoPageNumberPagination, self).get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+def get_paginated_response(view, query, wrap=lambda a: a, wrap_batch=None):
     pager = MongoPageNumberPagination()
     ds = pager.paginate_queryset(query, view.request, view=view)
-    rs = [wrap(a) for a in ds]
-    return pager.get_paginated_response(json_util._json_convert(rs))
+    # wrap_batch 一次处理整页数据，比逐行 wrap 少很多查询
+    rs = wrap_batch(list(ds)) if wrap_batch else [wrap(a) for a in ds]
+    return json_response(pager.get_paginated_response(rs).data)
+
+
+def json_response(data):
+    # 一次性序列化成 json 直接返回，跳过 DRF renderer 的再次遍历
+    return HttpResponse(json_dumps(data), content_type='application/json')
+
 
 
+@functools.lru_cache(maxsize=None)
+def get_schema():
+    # 进程内共用一个 Schema，避免每次都新建 OTS 客户端
+    return Schema()
+
+
+# json schema 类型 -> DRF 字段类
+_FIELD_MAP = {
+    'string': fields.CharField,
+    'integer': fields.IntegerField,
+    'number': fields.FloatField,
+    'boolean': fields.BooleanField,
+    'array': fields.ListField,
+    'object': fields.JSONField,
+    # 二进制列不能直接用 json 表单编辑，只读输出
+    'binary': functools.partial(fields.CharField, read_only=True),
+}
+
 
 class MongoSerializer(serializers.ModelSerializer):
+    # store.name -> {字段名: 字段类}，每个进程只读取一次 schema
+    _fields_cache = {}
 
     def get_fields(self):
         assert hasattr(self, 'Meta'), (
@@ -45,20 +172,17 @@ class MongoSerializer(serializers.ModelSerializer):
                 serializer_class=self.__class__.__name__
             )
         )
-        schema = Schema()
         store = self.Meta.store
-        rs = {}
-        fm = {
-            'string': fields.CharField,
-            'integer': fields.IntegerField,
-            'number': fields.FloatField,
-            'array': fields.ListField,
-            'object': fields.JSONField
-        }
-        for fn, ft in schema.desc(store.name).items():
-            field = fm[ft]()
-            rs[fn] = field
-        return rs
+        field_classes = self.__class__._fields_cache.get(store.name)
+        if field_classes is None:
+            field_classes = self.__class__._fields_cache[store.name] = self.build_field_classes(store)
+        # DRF 会在字段实例上 bind，每次都要返回新的实例
+        return dict((fn, fc()) for fn, fc in field_classes.items())
+
+    def build_field_classes(self, store):
+        # desc 返回整行 schema 记录，字段类型在 guess 列里
+        d = get_schema().desc(store.name) or {}
+        return dict((fn, _FIELD_MAP[ft]) for fn, ft in (d.get('guess') or {}).items())
 
 
 mongo_posted = Signal()
@@ -89,7 +213,7 @@ class MongoViewSet(viewsets.ViewSet):
     def options(self, request, *args, **kwargs):
         # print(self.metadata_class)
         # return super(MongoViewSet, self).options(request, *args, **kwargs)
-        sc = Schema().desc(self.get_store().name)
+        sc = get_schema().desc(self.get_store().name)
         return response.Response(sc)
 
     def get_serialize_fields(self):
@@ -104,6 +228,8 @@ class MongoViewSet(viewsets.ViewSet):
         cond = self.store.normalize_filter(qps)
         # print(cond)
         cond = self.filter_query(cond)
+        # 分页总数的缓存 key 需要过滤后的最终查询
+        self.resolved_query = cond
         randc = qps.get('_random')
         ordering = qps.get('ordering')
         kwargs = {}
@@ -111,21 +237,28 @@ class MongoViewSet(viewsets.ViewSet):
             kwargs['sort'] = [ordering_to_sort(ordering)]
         if randc:
             rs = self.store.random_find(cond, count=int(randc), fields=self.get_serialize_fields())
-            return response.Response(dict(results=json_util._json_convert(rs)))
-        rs = self.store.find(cond, self.get_serialize_fields(), **kwargs)
-        return get_paginated_response(self, rs, wrap=self.eval_foreign_keys)
+            return json_response(dict(results=rs))
+        # 只取需要序列化的列，减少传输
+        rs = self.store.find(cond, columns=self.get_serialize_fields(), **kwargs)
+        return get_paginated_response(self, rs, wrap_batch=self.eval_foreign_keys_batch)
 
     def eval_foreign_keys(self, d):
         fks = getattr(self, 'foreign_keys', None)
         return self.store.eval_foreign_keys(d, foreign_keys=fks)
 
+    def eval_foreign_keys_batch(self, ds):
+        fks = getattr(self, 'foreign_keys', None)
+        return self.store.eval_foreign_keys_batch(ds, foreign_keys=fks)
+
     def get_object(self, id=None):
         _id = id if id else self.kwargs['pk']
-        cond = {'_id': ObjectId(_id)}
-        return json_util._json_convert(self.eval_foreign_keys(self.store.collection.find_one(cond, None)))
+        d = self.store.get({self.store.pks[0]: _id})
+        if d is None:
+            raise exceptions.NotFound()
+        return self.eval_foreign_keys(d)
 
     def retrieve(self, request, pk):
-        return response.Response(self.get_object())
+        return json_response(self.get_object())
 
     def get_serialized_data(self):
         d = {}
@@ -133,18 +266,22 @@ class MongoViewSet(viewsets.ViewSet):
         return d
 
     def update(self, request, pk, *args, **kargs):
-        instance = self.get_object()
         data = self.get_serialized_data()
-        # print(data)
-        self.store.update({'_id': ObjectId(pk)}, data)
-        new_instance = self.get_object()
+        # 不再预先读取一次，行是否存在交给 update 的行条件判断
+        try:
+            self.store.update({self.store.pks[0]: pk}, data)
+        except OTSServiceError as e:
+            if e.code == 'OTSConditionCheckFail':
+                raise exceptions.NotFound()
+            raise
+        new_instance = self.get_object(pk)
         mongo_posted.send_robust(sender=type(self), instance=new_instance, update=data, created=False)
-        return response.Response(json_util._json_convert(new_instance))
+        return json_response(new_instance)
 
     def create(self, request, *args, **kargs):
         data = self.get_serialized_data()
         r = self.store.collection.insert_one(data)
-        return response.Response(self.get_object(r.inserted_id))
+        return json_response(self.get_object(r.inserted_id))
 
     def patch(self, request, pk, *args, **kargs):
         return self.update(request, pk, *args, **kargs)
@@ -1,21 +1,50 @@
 from .store import Store
 import datetime
-from .utils import json_schema
+from .utils import json_schema, TTLCache
+
+# 表名 -> desc 结果，避免每个请求都回表读取 schema
+_DESC_CACHE = TTLCache(maxsize=256, ttl=300)
 
 class Schema(Store):
     name = 'XYZ_STORE_SCHEMA'
+    primary_key_schema = [('name', 'STRING')]
 
-    def guess(self, name, *args, **kwargs):
+    def _guess(self, name, *args, **kwargs):
+        # 串行推断：json_schema 很轻，放进进程池时 pickle 的开销远大于推断本身，
+        # 且 Django 请求里 fork 子进程有死锁风险
         st = Store(name=name)
         rs = {}
         for d in st.random_find(*args, **kwargs):
             rs.update(json_schema(d))
+        return rs
+
+    def guess(self, name, *args, **kwargs):
+        rs = self._guess(name, *args, **kwargs)
         self.upsert({'name': name}, {'guess': rs})
+        self.invalidate(name)
+        return rs
+
+    def guess_many(self, names, *args, **kwargs):
+        """
+        一次推断多张表，结果攒起来用 bulk_upsert 一起写入
+        """
+        rs = dict((name, self._guess(name, *args, **kwargs)) for name in names)
+        self.bulk_upsert([{'name': name, 'guess': g} for name, g in rs.items()])
+        for name in rs:
+            self.invalidate(name)
         return rs
 
+    def invalidate(self, name):
+        _DESC_CACHE.pop(name)
+
     def desc(self, name, *args, **kwargs):
-        d = self.collection.find_one({'name': name}, {'_id': 0})
+        d = _DESC_CACHE.get(name)
+        if d is not None:
+            return d
+        d = self.get({'name': name})
         if not d or not d.get('guess'):
             self.guess(name, *args, **kwargs)
-            d = self.collection.find_one({'name': name}, {'_id': 0})
+            d = self.get({'name': name})
+        if d is not None:
+            _DESC_CACHE.set(name, d)
         return d
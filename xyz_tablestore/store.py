@@ -1,9 +1,53 @@
 from datetime import datetime
-import os, json, logging, math, base64, copy, logging
+import os, json, logging, math, base64, functools, itertools, logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from tablestore import *
 from xyz_tablestore.lookup import build_tablestore_query
 from tablestore import INF_MIN, INF_MAX, Direction
-from .utils import encode, decode, dict2row, row2dict, get_client, map_encode
+from .utils import encode, decode, dict2row, row2dict, get_client, map_encode, query_hash, TTLCache, batch_write_rows, BATCH_WRITE_LIMIT
+
+# 分页查询的 total_count 缓存: (表名, 索引名, 表的写入代数, 查询 hash) -> total
+_COUNT_CACHE = TTLCache(maxsize=1024)
+# 表名 -> 写入代数；每次写入后换一个新值，旧代数的缓存项不再命中，随 LRU/过期淘汰
+_COUNT_GENERATION = {}
+_GENERATION_SEQ = itertools.count(1)
+# count() 自己的短时缓存，key 同 _COUNT_CACHE；轮询的看板只能拿到几秒内的总数
+_COUNT_FAST_CACHE = TTLCache(maxsize=256, ttl=2)
+# page_no 翻页的 token 缓存: (表名, 索引名, 查询 hash, 排序, 列, 路由键, page_size, page_no) -> 该页的 next_token
+_PAGE_TOKEN_CACHE = TTLCache(maxsize=1024, ttl=300)
+
+@functools.lru_cache(maxsize=128)
+def _build_sort(sort_fields):
+    # 相同排序条件的翻页请求共用一个 Sort 对象
+    return Sort(sorters=[
+        FieldSort(field, sort_order=order) for field, order in sort_fields
+    ])
+
+@functools.lru_cache(maxsize=128)
+def _columns_to_get(columns=None):
+    # columns 为列名 tuple，None 表示取全部列
+    if columns:
+        return ColumnsToGet(return_type=ColumnReturnType.SPECIFIED, column_names=list(columns))
+    return ColumnsToGet(return_type=ColumnReturnType.ALL)
+
+# count / 跳页只需要 token 和总数，不取任何列
+_NO_COLUMNS = ColumnsToGet(return_type=ColumnReturnType.NONE)
+
+def _invalidates_count(func):
+    # 写操作返回（或抛异常）之后再使 total_count 缓存失效，
+    # 写入过程中并发的查询即使缓存了旧的总数，也落在旧代数下
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.invalidate_count()
+    return wrapper
+
+def _is_pk_column(c):
+    # 主键列形如 (列名, 值)
+    return isinstance(c, tuple) and len(c) == 2 and isinstance(c[0], str)
 
 class SuppressConditionCheckFail(logging.Filter):
     def filter(self, record):
@@ -13,6 +57,9 @@ class Store:
     primary_key_schema = [('id', 'STRING')]
     name = 'test'
     MAX_OFFSET = 10000
+    BATCH_GET_LIMIT = 100  # batch_get_row 单次请求最多 100 行
+    COUNT_CACHE_TTL = 60  # 翻页时复用 total_count 的秒数
+    COUNT_FAST_TTL = 2  # 重复的 count() 直接返回缓存结果的秒数
 
     def __init__(self, name=None, index_name=None):
         self.client = get_client()
@@ -20,6 +67,7 @@ class Store:
             self.name = name
         self.index_name = index_name if index_name else f'{self.name}_index'
         self.pks = [f[0] for f in self.primary_key_schema]
+        self._pk_set = frozenset(self.pks)
 
     def create(self):
         table_meta = TableMeta(self.name, self.primary_key_schema)
@@ -36,35 +84,88 @@ class Store:
 
 
     def batch_get(self, pks, **kwargs):
+        """
+        通过 batch_get_row 批量读取，按 pks 的顺序返回存在的行
+        """
+        kwargs.setdefault('max_version', 1)
+        pks = list(pks)
         rs = []
-        for pk in pks:
-            d = self.get(pk, **kwargs)
-            if d:
-                rs.append(d)
+        for i in range(0, len(pks), self.BATCH_GET_LIMIT):
+            request = BatchGetRowRequest()
+            request.add(TableInBatchGetRowItem(
+                self.name, [list(pk.items()) for pk in pks[i:i + self.BATCH_GET_LIMIT]], **kwargs
+            ))
+            for item in self.client.batch_get_row(request).get_result_by_table(self.name):
+                if not item.is_ok:
+                    logging.warning(f'batch get {self.name} failed: {item.error_code} {item.error_message}')
+                elif item.row and item.row.primary_key:
+                    rs.append(row2dict(item.row))
         return rs
 
+    def eval_foreign_keys(self, d, foreign_keys=None):
+        return self.eval_foreign_keys_batch([d], foreign_keys)[0]
+
+    def eval_foreign_keys_batch(self, docs, foreign_keys=None):
+        """
+        批量展开外键，foreign_keys 为 {字段名: 目标表名}，字段值为目标表的主键值。
+        每个目标表只做一轮 batch_get，避免逐行逐字段查询
+        """
+        if not foreign_keys:
+            return docs
+        ids = defaultdict(set)
+        for d in docs:
+            for fn, sn in foreign_keys.items():
+                v = d.get(fn)
+                if v is not None and not isinstance(v, (list, dict)):
+                    ids[sn].add(v)
+
+        found = {}
+        for sn, vs in ids.items():
+            st = Store(name=sn)
+            pk = st.pks[0]
+            found[sn] = dict((r[pk], r) for r in st.batch_get([{pk: v} for v in vs]))
+
+        for d in docs:
+            for fn, sn in foreign_keys.items():
+                v = d.get(fn)
+                if v is not None and not isinstance(v, (list, dict)) and v in found.get(sn, {}):
+                    d[fn] = found[sn][v]
+        return docs
+
     def save(self, d):
         return self.upsert(d)
 
+    @_invalidates_count
     def insert(self, d):
-        return self.client.put_row(self.name, dict2row(d, self.pks), condition=Condition(RowExistenceExpectation.IGNORE))
+        return self.client.put_row(self.name, dict2row(d, self.pks, self._pk_set), condition=Condition(RowExistenceExpectation.IGNORE))
 
+    @_invalidates_count
     def upsert(self, cond, put={}, set_on_insert={}, **kwargs):
+        """
+        返回 (created, response)。没有 set_on_insert 时只发一次 update_row，
+        此时无法区分插入还是更新，created 为 None
+        """
         for k in self.pks:
             if k not in cond:
                 raise ValueError(f"Missing primary key field: {k}")
         d = dict(**cond)
         d.update(put)
-        row = dict2row(d, self.pks)
+        row = dict2row(d, self.pks, self._pk_set)
+        urow = Row(
+            primary_key=row.primary_key,
+            attribute_columns=dict(put=row.attribute_columns, **dict([(k, list(v.items())) for k,v in kwargs.items()]))
+        )
+        if not set_on_insert and (row.attribute_columns or kwargs):
+            # put/increment 对不存在的行同样生效（increment 从 0 开始），不必先试探 put_row
+            return None, self.client.update_row(self.name, urow, Condition(RowExistenceExpectation.IGNORE))
 
         irow = Row(
             primary_key=row.primary_key,
-            attribute_columns=copy.copy(row.attribute_columns)
+            attribute_columns=row.attribute_columns[:]
         )
         if 'increment' in kwargs:
             irow.attribute_columns+=list(kwargs['increment'].items())
-        if set_on_insert:
-            irow.attribute_columns += list(set_on_insert.items())
+        irow.attribute_columns += list(set_on_insert.items())
         logger = self.client.logger
         filt = SuppressConditionCheckFail()
         try:
@@ -78,20 +179,65 @@ class Store:
         finally:
             logger.removeFilter(filt)
 
-        # print(row)
-        urow = Row(
-            primary_key=row.primary_key,
-            attribute_columns=dict(put=row.attribute_columns, **dict([(k, list(v.items())) for k,v in kwargs.items()]))
-        )
         return False, self.client.update_row(self.name, urow, Condition(RowExistenceExpectation.IGNORE))
 
+    @_invalidates_count
+    def update(self, cond, put):
+        """
+        只更新已存在的行，行不存在时抛出 OTSServiceError(OTSConditionCheckFail)
+        """
+        for k in self.pks:
+            if k not in cond:
+                raise ValueError(f"Missing primary key field: {k}")
+        d = dict(**put)
+        d.update(cond)
+        row = dict2row(d, self.pks, self._pk_set)
+        urow = Row(primary_key=row.primary_key, attribute_columns=dict(put=row.attribute_columns))
+        return self.client.update_row(self.name, urow, Condition(RowExistenceExpectation.EXPECT_EXIST))
+
+    @_invalidates_count
+    def save_many(self, ds, batch=BATCH_WRITE_LIMIT):
+        """
+        批量整行写入（同 insert，已存在的行会被覆盖），返回最终仍失败的项，
+        每项的 index 为该行在 ds 中的位置，可据此重试
+        """
+        items = [PutRowItem(dict2row(d, self.pks, self._pk_set), Condition(RowExistenceExpectation.IGNORE)) for d in ds]
+        if not items:
+            return []
+        return batch_write_rows(self.client, self.name, items, batch_size=batch)
+
+    @_invalidates_count
+    def bulk_upsert(self, docs, chunk=BATCH_WRITE_LIMIT):
+        """
+        批量 upsert，每 chunk 行一个 batch_write_row 请求，返回最终仍失败的项（index 为该行在 docs 中的位置）。
+        与 upsert(d) 一样只覆盖 d 里给出的列，不会清掉已有的其他列
+        """
+        items = []
+        for d in docs:
+            for k in self.pks:
+                if k not in d:
+                    raise ValueError(f"Missing primary key field: {k}")
+            row = dict2row(d, self.pks, self._pk_set)
+            if row.attribute_columns:
+                items.append(UpdateRowItem(
+                    Row(row.primary_key, dict(put=row.attribute_columns)),
+                    Condition(RowExistenceExpectation.IGNORE)
+                ))
+            else:
+                # 只有主键时和 upsert 一样：行不存在才插入，已存在的不动
+                items.append(PutRowItem(row, Condition(RowExistenceExpectation.EXPECT_NOT_EXIST)))
+        if not items:
+            return []
+        failed = batch_write_rows(self.client, self.name, items, batch_size=chunk)
+        return [f for f in failed if f.error_code != 'OTSConditionCheckFail']
+
+    upsert_many = bulk_upsert
+
 
     def _get_sort(self, sort_fields):
         if not sort_fields:
             return None
-        return Sort(sorters=[
-            FieldSort(field, order=order) for field, order in sort_fields
-        ])
+        return _build_sort(tuple((field, order) for field, order in sort_fields))
 
     def _get_edge_pks(self, pks, edge='begin'):
         if edge=='begin':
@@ -111,18 +257,50 @@ class Store:
             direction = Direction.FORWARD
         return direction
 
-    def count(self, query={}, index_name=None,):
-        query = build_tablestore_query(query)
+    def _count_key(self, query, index_name=None):
+        return (self.name, index_name or self.index_name, _COUNT_GENERATION.get(self.name, 0), query_hash(query))
+
+    def _page_token_key(self, query, sort_fields, page_size, page_no, index_name=None, columns=None, routing_key=None):
+        return (
+            self.name, index_name or self.index_name, query_hash(query), repr(sort_fields),
+            repr(columns), repr(routing_key), page_size, page_no
+        )
+
+    def invalidate_count(self, query=None, index_name=None):
+        """
+        清除 total_count 缓存，query 为 None 时清除本表的所有缓存（换一个写入代数，O(1)）
+        """
+        if query is None:
+            _COUNT_GENERATION[self.name] = next(_GENERATION_SEQ)
+        else:
+            key = self._count_key(query, index_name)
+            _COUNT_CACHE.pop(key)
+            _COUNT_FAST_CACHE.pop(key)
+
+    def count(self, query={}, index_name=None, fresh=False):
+        """
+        返回命中总数，COUNT_FAST_TTL 秒内相同查询直接用缓存，fresh=True 时强制回表
+        """
+        key = self._count_key(query, index_name)
+        if not fresh:
+            total = _COUNT_FAST_CACHE.get(key)
+            if total is not None:
+                return total
+        # limit=0 只统计总数，不返回任何行
         search_q = SearchQuery(
-            query=query,
-            get_total_count=True
+            query=build_tablestore_query(query),
+            get_total_count=True,
+            limit=0
         )
         rs = self.client.search(
             table_name=self.name,
             index_name=index_name or self.index_name,
             search_query=search_q,
-            columns_to_get=ColumnsToGet(return_type=ColumnReturnType.NONE)
+            columns_to_get=_NO_COLUMNS
         )
+        _COUNT_FAST_CACHE.set(key, rs.total_count, self.COUNT_FAST_TTL)
+        # 同时供 search 翻页复用
+        _COUNT_CACHE.set(key, rs.total_count, self.COUNT_CACHE_TTL)
         return rs.total_count
 
     def search(
@@ -134,24 +312,69 @@ class Store:
             page_size=10,
             next_token=None,
             index_name=None,
-            max_page_no_limit=True
+            max_page_no_limit=True,
+            want_total=True,  # False 时不统计总数，total/total_pages 为 None
+            use_cursor=False,  # True 时 page_no 通过 token 逐段跳转，不用服务端 offset
+            routing_key=None,  # 路由主键，如 uid 或 {'user_id': uid}，同一用户的翻页落到同一分区
+            _raw_next_token=False  # find 内部翻页用，next_token 直接返回 bytes 不做 base64
     ):
+        """
+        page_no 模式基于服务端 offset，越往后越慢且受 MAX_OFFSET 限制，属于旧用法；
+        深度翻页请用 next_token，或 use_cursor=True / search_from_cursor
+        """
         if page_size < 1:
             page_size = 10
         if page_size > 100:
             page_size = 100
 
-        query = build_tablestore_query(query)
-
-        sort = self._get_sort(sort_fields)
-
         if page_no is not None and next_token is not None:
             raise ValueError("Cannot use both page_no and token")
 
+        # 先校验 offset，超限的请求不必再构建查询
+        if next_token is None:
+            if page_no is None or page_no < 1:
+                page_no = 1
+            offset = (page_no - 1) * page_size
+            if max_page_no_limit and not use_cursor and offset > self.MAX_OFFSET:
+                raise ValueError(
+                    f"Page number too large. Max allowed page_no is "
+                    f"{self.MAX_OFFSET // page_size + 1} (offset <= {self.MAX_OFFSET})"
+                )
+
+        raw_query = query
+        if isinstance(columns, dict):
+            # 兼容 mongo 风格的 projection: {字段: 1}，在读写 token 缓存之前统一成列名 list
+            columns = [k for k, v in columns.items() if v]
+
+        if next_token is None and page_no > 1:
+            # 最近翻到过前一页时直接用缓存的 token，不再走 offset
+            token = _PAGE_TOKEN_CACHE.get(self._page_token_key(raw_query, sort_fields, page_size, page_no, index_name, columns, routing_key))
+            if token is not None or use_cursor:
+                if token is not None:
+                    rs = self.search(
+                        raw_query, columns, sort_fields, page_size=page_size, next_token=token,
+                        index_name=index_name, want_total=want_total, routing_key=routing_key, _raw_next_token=_raw_next_token
+                    )
+                else:
+                    rs = self.search_from_cursor(
+                        None, page_no - 1, raw_query, columns=columns, sort_fields=sort_fields, page_size=page_size,
+                        index_name=index_name, want_total=want_total, routing_key=routing_key, _raw_next_token=_raw_next_token
+                    )
+                rs.update(page_no=page_no, has_prev=True, has_next=rs["has_more"], can_jump_to_page=True)
+                if rs["next_token"]:
+                    _PAGE_TOKEN_CACHE.set(self._page_token_key(raw_query, sort_fields, page_size, page_no + 1, index_name, columns, routing_key), rs["next_token"])
+                return rs
+
+        query = build_tablestore_query(query)
+        sort = self._get_sort(sort_fields)
+
+        # 只有第一页向服务端请求 total_count，后续翻页复用缓存
+        first_page = want_total and next_token is None and page_no == 1
+        # 默认值（get_total_count=False、offset=0）不显式设置，None 时 SDK 不写入请求
         search_q = SearchQuery(
             query=query,
             sort=sort,
-            get_total_count=True
+            get_total_count=True if first_page else None
         )
         if next_token is not None:
             # ===== Token 分页（推荐用于深度分页）=====
@@ -159,29 +382,13 @@ class Store:
             search_q.next_token=base64.urlsafe_b64decode(next_token.encode('ascii')) if isinstance(next_token, str) else next_token
         else:
             # ===== PageNo 分页（仅用于浅层）=====
-            if page_no is None:
-                page_no = 1
-            if page_no < 1:
-                page_no = 1
-
-            offset = (page_no - 1) * page_size
-
-            if max_page_no_limit and offset > self.MAX_OFFSET:
-                raise ValueError(
-                    f"Page number too large. Max allowed page_no is "
-                    f"{self.MAX_OFFSET // page_size + 1} (offset <= {self.MAX_OFFSET})"
-                )
-
-            search_q.offset=offset
+            if offset:
+                search_q.offset=offset
             search_q.limit=page_size
 
-        if columns:
-            columns_to_get = ColumnsToGet(
-                return_type=ColumnReturnType.SPECIFIED,
-                column_names=columns
-            )
-        else:
-            columns_to_get = ColumnsToGet(return_type=ColumnReturnType.ALL)
+        columns_to_get = _columns_to_get(tuple(columns) if columns else None)
+        # 在请求之前取 key（含写入代数），请求期间发生的写入会让这次拿到的总数落在旧代数下
+        count_key = self._count_key(raw_query, index_name) if want_total else None
 
         # 执行搜索
         try:
@@ -189,30 +396,44 @@ class Store:
                 table_name=self.name,
                 index_name=index_name or self.index_name,
                 search_query=search_q,
-                columns_to_get=columns_to_get
+                columns_to_get=columns_to_get,
+                routing_keys=self._routing_keys(routing_key)
             )
 
             items = []
             for item in rs.rows:
                 items.append(row2dict(item))
 
-            total = rs.total_count
-            total_pages = math.ceil(total / page_size) if total > 0 else 1
+            if first_page:
+                total = rs.total_count
+                _COUNT_CACHE.set(count_key, total, self.COUNT_CACHE_TTL)
+            elif want_total:
+                total = _COUNT_CACHE.get(count_key)
+                if total is None:
+                    total = self.count(raw_query, index_name)
+            else:
+                total = None
+            if total is None:
+                total_pages = None
+            else:
+                total_pages = math.ceil(total / page_size) if total > 0 else 1
             result = {
                 "items": items,
                 "total": total,
                 "page_size": page_size,
-                "next_token": base64.urlsafe_b64encode(rs.next_token).decode('ascii'),
+                "next_token": rs.next_token if _raw_next_token else base64.urlsafe_b64encode(rs.next_token).decode('ascii'),
                 "has_more": bool(rs.next_token),
                 "total_pages": total_pages,
             }
 
             if next_token is None:
-                # 当前是 pageNo 模式
+                # 当前是 pageNo 模式，记下下一页的 token 供后续翻页使用
+                if rs.next_token:
+                    _PAGE_TOKEN_CACHE.set(self._page_token_key(raw_query, sort_fields, page_size, page_no + 1, index_name, columns, routing_key), rs.next_token)
                 result.update({
                     "page_no": page_no,
                     "has_prev": page_no > 1,
-                    "has_next": page_no < total_pages,
+                    "has_next": page_no < total_pages if total_pages is not None else result["has_more"],
                     "can_jump_to_page": offset <= self.MAX_OFFSET  # 是否允许继续用 pageNo
                 })
             else:
@@ -227,6 +448,100 @@ class Store:
             raise
 
 
+    def search_iter(self, query=None, columns=None, sort_fields=None, page_size=100, next_token=None,
+                    index_name=None, routing_key=None, auto_continue=True):
+        """
+        逐行 yield 搜索结果，不先拼出整页列表；auto_continue 时按 next_token 继续翻页直到结束
+        """
+        if isinstance(columns, dict):
+            columns = [k for k, v in columns.items() if v]
+        query = build_tablestore_query(query)
+        sort = self._get_sort(sort_fields)
+        columns_to_get = _columns_to_get(tuple(columns) if columns else None)
+        token = base64.urlsafe_b64decode(next_token.encode('ascii')) if isinstance(next_token, str) else next_token
+        while True:
+            search_q = SearchQuery(query=query, sort=sort, limit=min(max(page_size, 1), 100), next_token=token, get_total_count=None)
+            rs = self.client.search(
+                table_name=self.name,
+                index_name=index_name or self.index_name,
+                search_query=search_q,
+                columns_to_get=columns_to_get,
+                routing_keys=self._routing_keys(routing_key)
+            )
+            for item in rs.rows:
+                yield row2dict(item)
+            token = rs.next_token
+            if not auto_continue or not token:
+                break
+
+    def _routing_keys(self, routing_key):
+        """
+        routing_key 可以是分区键（第一个主键列）的值、{主键列: 值}、[(主键列, 值), ...]，
+        或由它们组成的 list（查询多个分区），转换为 SDK 需要的主键列表的列表
+        """
+        if routing_key is None:
+            return None
+        if isinstance(routing_key, (list, tuple)) and not all(_is_pk_column(c) for c in routing_key):
+            return [self._routing_pk(k) for k in routing_key] or None
+        pk = self._routing_pk(routing_key)
+        return [pk] if pk else None
+
+    def _routing_pk(self, key):
+        if type(key) in (str, bytes, int):
+            return [(self.pks[0], key)]
+        if isinstance(key, dict):
+            return list(key.items())
+        if isinstance(key, (list, tuple)) and all(_is_pk_column(c) for c in key):
+            return list(key)
+        raise ValueError(f"Invalid routing_key: {key!r}, expected a partition key value, dict or list of (column, value)")
+
+    def _skip_rows(self, query, sort, n, index_name=None, next_token=None, routing_key=None):
+        """
+        只取 token 不取列地向后跳过 n 行，返回跳过后的 next_token，已到末尾时返回 None
+        """
+        while n > 0:
+            search_q = SearchQuery(query=query, sort=sort, limit=min(n, 100), next_token=next_token, get_total_count=None)
+            rs = self.client.search(
+                table_name=self.name,
+                index_name=index_name or self.index_name,
+                search_query=search_q,
+                columns_to_get=_NO_COLUMNS,
+                routing_keys=self._routing_keys(routing_key)
+            )
+            if not rs.rows or not rs.next_token:
+                return None
+            next_token = rs.next_token
+            n -= len(rs.rows)
+        return next_token
+
+    def search_from_cursor(self, cursor=None, skip_pages=0, query=None, sort_fields=None, page_size=10, index_name=None, **kwargs):
+        """
+        从 cursor（search 返回的 next_token，None 表示第一页）起跳过 skip_pages 页再返回一页。
+        跳过的页每次最多 100 行且不取列，代替服务端 offset 实现“跳到第 N 页”
+        """
+        if page_size < 1:
+            page_size = 10
+        if page_size > 100:
+            page_size = 100
+        token = base64.urlsafe_b64decode(cursor.encode('ascii')) if isinstance(cursor, str) else cursor
+        if skip_pages > 0:
+            token = self._skip_rows(
+                build_tablestore_query(query), self._get_sort(sort_fields), skip_pages * page_size, index_name, token,
+                routing_key=kwargs.get('routing_key')
+            )
+            if token is None:
+                # 已超出末尾
+                return {
+                    "items": [], "total": None, "page_size": page_size, "next_token": None,
+                    "has_more": False, "total_pages": None, "page_no": None, "has_next": False,
+                    "can_jump_to_page": False,
+                }
+        if token is None:
+            return self.search(query, sort_fields=sort_fields, page_size=page_size, index_name=index_name, **kwargs)
+        rs = self.search(query, sort_fields=sort_fields, page_size=page_size, next_token=token, index_name=index_name, **kwargs)
+        rs["has_next"] = rs["has_more"]
+        return rs
+
     def sql_query(self, sql, **kwargs):
         rows, reserved, consumption = self.client.exe_sql_query(sql)
         return [row2dict(a) for a in rows]
@@ -234,11 +549,20 @@ class Store:
     def find(self, *args, limit=1000, **kwargs):
         # 移除 page_no，确保始终用 token 模式
         kwargs.pop('page_no', None)
+        kwargs['want_total'] = False
+        kwargs['_raw_next_token'] = True
         rs = self.search(*args, **kwargs)
-        yield from rs['items']
-        while rs['next_token']:
-            rs = self.search(*args, **kwargs, next_token=rs['next_token'])
-            yield from rs['items']
+        # 消费当前页的同时预取下一页，让网络往返与调用方的处理重叠
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            while True:
+                future = executor.submit(self.search, *args, next_token=rs['next_token'], **kwargs) if rs['has_more'] else None
+                yield from rs['items']
+                if future is None:
+                    break
+                rs = future.result()
+        finally:
+            executor.shutdown(wait=False)
 
     def table_exists(self):
         try:
@@ -258,6 +582,7 @@ class Store:
     def all(self, batch_size=100, columns=None):
         """
         全表遍历（主键顺序扫描）
+        批次从小到大翻倍增长（首批更快返回），并在消费当前批时预取下一批
         """
         if batch_size < 1:
             batch_size = 100
@@ -269,29 +594,39 @@ class Store:
         # 结束主键：最大（必须提供，不能是 None）
         end_pk = [(pk, INF_MAX) for pk in self.pks]
 
-        while True:
+        def fetch(start_pk, limit):
             consumed, next_start_pk, rows, *_ = self.client.get_range(
                 table_name=self.name,
                 direction=Direction.FORWARD,
                 inclusive_start_primary_key=start_pk,
                 exclusive_end_primary_key=end_pk,
                 max_version=1,
-                limit=batch_size,
+                limit=limit,
                 columns_to_get=columns if columns else None
             )
+            return rows, next_start_pk
 
-            if not rows:
-                break
-
-            for row in rows:
-                yield row2dict(row)
-
-            # 扫描结束
-            if not next_start_pk:
-                break
-
-            # 用 SDK 返回的 next_start_pk 继续
-            start_pk = next_start_pk
+        cur = min(batch_size, max(50, batch_size // 4))
+        rows, next_start_pk = fetch(start_pk, cur)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            while rows:
+                future = None
+                # 用 SDK 返回的 next_start_pk 继续，为空表示扫描结束
+                if next_start_pk:
+                    # 上一批没取满说明受服务端单次数据量限制，加大 limit 也没用
+                    if len(rows) >= cur:
+                        cur = min(cur * 2, batch_size)
+                    future = executor.submit(fetch, next_start_pk, cur)
+
+                for row in rows:
+                    yield row2dict(row)
+
+                if future is None:
+                    break
+                rows, next_start_pk = future.result()
+        finally:
+            executor.shutdown(wait=False)
 
 
 
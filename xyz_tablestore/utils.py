@@ -1,56 +1,286 @@
-import datetime, json, os, logging
+import datetime, functools, json, math, os, re, logging, hashlib, threading, time
+from collections import OrderedDict
 from tablestore import *
 
-def get_client(
-        endpoint=os.getenv('OTS_ENDPOINT', ''),
-        instance_name=os.getenv('OTS_DB', 'test'),
-        access_key_id=os.getenv('OTS_KEY_ID'),
-        access_key_secret=os.getenv('OTS_KEY_SECRET')
-):
+# json 实现按 orjson -> ujson（PyPy 下 orjson 不可用）-> 标准库 json 的顺序选择
+try:
+    import orjson
+except ImportError:
+    orjson = None
+ujson = None
+if orjson is None:
+    try:
+        import ujson
+    except ImportError:
+        pass
+
+def _is_numpy(v):
+    # 不依赖 numpy：numpy 数组和标量都有 tolist()
+    return type(v).__module__ == 'numpy' and hasattr(v, 'tolist')
+
+def _json_default(o):
+    # 写入存储用：datetime/date/time 统一用 isoformat，numpy 转成 list/标量，其他类型直接报错，不做有损转换
+    if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+        return o.isoformat()
+    if _is_numpy(o):
+        return o.tolist()
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def _response_default(o):
+    # 输出给接口用：与 DRF 的 JSONEncoder 一样把 bytes 解码成字符串，其余无法序列化的值转成字符串
+    if isinstance(o, (bytes, bytearray)):
+        return o.decode()
+    try:
+        return _json_default(o)
+    except TypeError:
+        return str(o)
+
+def _std_dumps(v, default=_json_default):
+    # 与 orjson 一样直接输出非 ASCII 字符、使用紧凑的分隔符
+    return json.dumps(v, ensure_ascii=False, separators=(',', ':'), default=default)
+
+def _has_nan(v):
+    # orjson 把 NaN/Infinity 写成 null，这类值要交给标准库才能原样存回
+    if _is_numpy(v):
+        return _has_nan(v.tolist())
+    if isinstance(v, float):
+        return not math.isfinite(v)
+    if isinstance(v, dict):
+        return any(_has_nan(x) for x in v.values())
+    if isinstance(v, (list, tuple)):
+        return any(_has_nan(x) for x in v)
+    return False
+
+if orjson:
+    _JSON_IMPL = 'orjson'
+    _loads = orjson.loads
+    # 直接支持 numpy 和非 str 的 dict key；datetime 交给 _json_default，
+    # naive datetime 按原样（本地时间）输出，格式与其他实现相同
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _dumps(v, default=_json_default):
+        try:
+            s = orjson.dumps(v, default=default, option=_ORJSON_OPTS)
+        except TypeError:  # orjson 不支持的类型（如超出 64 位的整数）交给标准库处理
+            return _std_dumps(v, default)
+        # 只有输出里有 null 时才需要检查是否含 NaN/Infinity
+        if b'null' in s and _has_nan(v):
+            return _std_dumps(v, default)
+        return s.decode()
+elif ujson:
+    _JSON_IMPL = 'ujson'
+    _loads = ujson.loads
+
+    def _dumps(v, default=_json_default):
+        try:
+            return ujson.dumps(v, ensure_ascii=False, escape_forward_slashes=False, default=default)
+        except (TypeError, OverflowError):
+            return _std_dumps(v, default)
+else:
+    _JSON_IMPL = 'json'
+    _loads = json.loads
+    _dumps = _std_dumps
+
+@functools.lru_cache(maxsize=8)
+def _cached_client(endpoint, instance_name, access_key_id, access_key_secret):
     return OTSClient(endpoint, access_key_id, access_key_secret, instance_name)
 
+def get_client(endpoint=None, instance_name=None, access_key_id=None, access_key_secret=None):
+    # 未传的参数在调用时读取环境变量；相同连接参数共用一个 OTSClient，复用其连接池
+    return _cached_client(
+        endpoint if endpoint is not None else os.getenv('OTS_ENDPOINT', ''),
+        instance_name if instance_name is not None else os.getenv('OTS_DB', 'test'),
+        access_key_id if access_key_id is not None else os.getenv('OTS_KEY_ID'),
+        access_key_secret if access_key_secret is not None else os.getenv('OTS_KEY_SECRET')
+    )
+
+def reset_client():
+    # 丢弃缓存的 OTSClient（如测试中修改了环境变量后）
+    _cached_client.cache_clear()
+
 def timestamp_ms(d=None):
     if not d:
         d = datetime.now()
     return math.floor(d.timestamp()*1000)
 
 
+_JSON_TYPES = (list, tuple, dict)
+
 def encode(v):
-    if isinstance(v, (list, tuple, dict)):
-        return json.dumps(v)
+    # 先按精确类型判断，常见标量直接返回，只有子类（如 OrderedDict）才走 isinstance
+    t = type(v)
+    if t is dict or t is list or t is tuple:
+        return _dumps(v)
+    if t is str or t is int or t is float:
+        return v
+    if isinstance(v, _JSON_TYPES):
+        return _dumps(v)
+    if _is_numpy(v):
+        # 顶层的 numpy 数组同样存为 json，numpy 标量转成 python 标量
+        v = v.tolist()
+        return _dumps(v) if type(v) is list else v
     return v
 
+def json_dumps(v):
+    # 接口输出整体序列化一次，bytes 解码成字符串，其他非 json 类型转成字符串（encode 遇到这些值会报错）
+    return _dumps(v, _response_default)
+
+# python 类型 -> json schema 类型名，按 type(v) 直接查表（bool 不会被当成 int）
+_TYPE_MAP = {
+    str: 'string',
+    int: 'integer',
+    float: 'number',
+    bool: 'boolean',
+    list: 'array',
+    tuple: 'array',
+    dict: 'object',
+    bytes: 'binary',
+    bytearray: 'binary',
+}
+
+def json_schema(d):
+    # 推断一行数据各字段的类型，None 和未知类型的字段跳过
+    rs = {}
+    for k, v in d.items():
+        t = _TYPE_MAP.get(type(v))
+        if t:
+            rs[k] = t
+    return rs
+
 def map_encode(d):
     return dict([(k, encode(v)) for k, v in d.items()])
 
+# json 数组/对象的首字符 -> 应有的尾字符
+_JSON_CLOSE = {'[': ']', '{': '}'}
+# 20 位以上的数字可能超出 64 位整数，orjson/ujson 会把它解析成 float
+_LONG_DIGITS_RE = re.compile(r'\d{20}')
+
+def _loads_exact(v):
+    if _loads is not json.loads and _LONG_DIGITS_RE.search(v) is None:
+        try:
+            return _loads(v)
+        except ValueError:
+            pass  # 如标准库写入的 NaN/Infinity，交给标准库再试一次
+    return json.loads(v)
+
 def decode(v):
-    if isinstance(v, str):
-        if (v.startswith('[') and v.endswith(']')) or (v.startswith('{') and v.endswith('}')):
-            try:
-                v = json.loads(v)
-            except Exception as e:
-                logging.warning(f'json error:{e}')
-            return v
+    # 只看首尾字符决定是否像 json，避免多次 startswith/endswith
+    if type(v) is str and v and _JSON_CLOSE.get(v[0]) == v[-1]:
+        try:
+            return _loads_exact(v)
+        except ValueError as e:
+            logging.warning(f'json error:{e}')
     return v
 
-def dict2row(d, pks):
-    d = dict(**d)
-    pfs = []
-    fs = []
-    for k in pks:
-        pfs.append((k, d.pop(k, None)))
-
-    for k, v in d.items():
-        if v is None:
-            continue
-        fs.append((k, encode(v)))
+def dict2row(d, pks, pk_set=None):
+    # 主键按 pks 顺序取出（缺失为 None），其余非 None 字段编码为属性列
+    # pk_set 为 frozenset(pks)，调用方可以预先算好传入
+    pfs = [(k, d.get(k)) for k in pks]
+    if pk_set is None:
+        pk_set = frozenset(pks)
+    fs = [(k, encode(v)) for k, v in d.items() if v is not None and k not in pk_set]
     return Row(pfs, fs)
 
 def row2dict(row):
-    d = dict()
-    r = row if isinstance(row, tuple) else [row.primary_key, row.attribute_columns]
-    for s in r:
-        for f in s:
-            d[f[0]] = decode(f[1])
+    if isinstance(row, tuple):
+        pk, attrs = row
+    else:
+        pk, attrs = row.primary_key, row.attribute_columns
+    # 主键列不会是 json，只有字符串属性列才需要尝试 decode
+    d = {f[0]: f[1] for f in pk}
+    dec = decode
+    for f in attrs:
+        v = f[1]
+        d[f[0]] = dec(v) if type(v) is str else v
     return d
 
+
+BATCH_WRITE_LIMIT = 200  # batch_write_row 单次请求最多 200 行
+
+def batch_write_rows(client, table_name, row_items, batch_size=BATCH_WRITE_LIMIT, retries=3, backoff=0.05):
+    """
+    按 batch_size 分批调用 batch_write_row 写入 PutRowItem/UpdateRowItem/DeleteRowItem,
+    失败的子操作会单独重试 retries 次, 第 n 次重试前等待 backoff * 2 ** (n - 1) 秒，避免限流时加重服务端压力，
+    返回最终仍失败的 BatchWriteRowResponseItem 列表,
+    每项的 index 为该行在 row_items 中的位置。
+    条件检查失败 (OTSConditionCheckFail) 重试也不会成功，直接返回不重试。
+    同一批内各行的写入顺序不做保证。
+    """
+    row_items = list(row_items)
+    failed = []
+    for i in range(0, len(row_items), batch_size):
+        chunk = row_items[i:i + batch_size]
+        positions = list(range(i, i + len(chunk)))  # chunk 内各行在 row_items 中的位置
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            request = BatchWriteRowRequest()
+            request.add(TableInBatchWriteRowItem(table_name, chunk))
+            rs = client.batch_write_row(request)
+            fails = []
+            retry = []
+            for f in rs.get_failed_of_put() + rs.get_failed_of_update() + rs.get_failed_of_delete():
+                # SDK 给出的 index 是本次请求内的位置，换算回 row_items 中的位置
+                retry_item = chunk[f.index]
+                f.set_index(positions[f.index])
+                if f.error_code == 'OTSConditionCheckFail':
+                    failed.append(f)
+                else:
+                    fails.append(f)
+                    retry.append(retry_item)
+            if not fails:
+                break
+            chunk = retry
+            positions = [f.index for f in fails]
+        else:
+            for f in fails:
+                logging.warning(f'batch write {table_name} failed: {f.error_code} {f.error_message}')
+            failed.extend(fails)
+    return failed
+
+
+def query_hash(query):
+    """
+    查询条件的稳定 hash，用作缓存 key
+    """
+    return hashlib.blake2b(json.dumps(query, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class TTLCache:
+    """
+    进程内的 LRU 缓存，条目在 ttl 秒后过期
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expire_at, value = item
+            if expire_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()